@@ -7,15 +7,8 @@ Usage: streamlit run run.py
 Developer: aliawada127001@outlook.com
 """
 
-import sys
-from pathlib import Path
-
-# Add src directory to path
-src_path = Path(__file__).parent / "src"
-sys.path.insert(0, str(src_path))
-
-# Import and run the main app
-from app import main
+# Import and run the main app from the src package
+from src.app import main
 
 if __name__ == "__main__":
     main()
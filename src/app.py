@@ -13,10 +13,10 @@ import pandas as pd
 from datetime import datetime
 from typing import Optional
 
-from config import config
-from query_processor import get_processor, get_data_manager, QueryResult
-from response_formatter import generate_visualization
-from logger import app_logger
+from .config import config
+from .query_processor import get_processor, QueryResult
+from .response_formatter import generate_visualization
+from .logger import app_logger
 
 
 # =============================================================================
@@ -334,11 +334,22 @@ def init_session_state():
         st.session_state.system_status = {}
 
 
+@st.cache_resource(show_spinner=False)
+def get_shared_processor():
+    """
+    Get the query processor shared across reruns and sessions.
+    
+    Keeps a single DataManager (with its cached DataFrame) and a single
+    Ollama client alive for the lifetime of the Streamlit server.
+    """
+    return get_processor()
+
+
 def check_system():
     """Check system status and initialize components."""
     try:
-        st.session_state.data_manager = get_data_manager()
-        st.session_state.processor = get_processor()
+        st.session_state.processor = get_shared_processor()
+        st.session_state.data_manager = st.session_state.processor.data_manager
         st.session_state.system_status = st.session_state.processor.check_system()
         st.session_state.system_ready = st.session_state.system_status.get('ready', False)
     except Exception as e:
@@ -19,9 +19,9 @@ import traceback
 import pandas as pd
 import numpy as np
 
-from config import config
-from exceptions import CodeExecutionError, ExecutionTimeoutError, ErrorCode
-from logger import executor_logger
+from .config import config
+from .exceptions import CodeExecutionError, ExecutionTimeoutError, ErrorCode
+from .logger import executor_logger
 
 
 @dataclass
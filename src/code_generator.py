@@ -8,17 +8,22 @@ for generating pandas code from natural language questions.
 Developer: aliawada127001@outlook.com
 """
 
+import asyncio
+import threading
 import time
+import weakref
 from dataclasses import dataclass
 from typing import Optional
 
 import ollama
-from ollama import Client
+from ollama import AsyncClient, Client
 
-from config import config
-from exceptions import CodeGenerationError, ErrorCode
-from logger import llm_logger
-from utils import extract_code_from_response, build_code_generation_prompt
+from .config import config
+from .exceptions import CodeGenerationError, ErrorCode
+from .logger import llm_logger
+from .utils import (
+    extract_code_from_response, build_code_generation_prompt, build_response_prompt, LRUCache
+)
 
 
 @dataclass
@@ -64,8 +69,13 @@ class CodeGenerator:
         self.temperature = temperature if temperature is not None else config.llm.temperature
         self.timeout = timeout or config.llm.timeout
         
-        # Initialize Ollama client
+        # Initialize Ollama client. Async clients are created on first use,
+        # one per event loop: their connection pools belong to that loop.
         self.client = Client(host=self.base_url)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._async_clients_lock = threading.Lock()
         
         llm_logger.info(
             "Code generator initialized",
@@ -73,6 +83,20 @@ class CodeGenerator:
             base_url=self.base_url
         )
     
+    @property
+    def async_client(self) -> AsyncClient:
+        """Get the async Ollama client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                # A pooled client can keep its loop alive, so drop the
+                # clients of loops that have finished (e.g. asyncio.run)
+                for old_loop in [l for l in self._async_clients if l.is_closed()]:
+                    del self._async_clients[old_loop]
+                client = self._async_clients[loop] = AsyncClient(host=self.base_url)
+        return client
+    
     def generate(self, prompt: str, max_retries: int = 2) -> GenerationResult:
         """
         Generate pandas code from a prompt.
@@ -99,79 +123,158 @@ class CodeGenerator:
                 response = self.client.generate(
                     model=self.model,
                     prompt=prompt,
-                    options={
-                        'temperature': self.temperature,
-                        'num_predict': config.llm.max_tokens,
-                    }
+                    options=self._options()
                 )
                 
-                raw_response = response.get('response', '')
-                
-                if not raw_response:
-                    raise CodeGenerationError(
-                        message="Empty response from LLM",
-                        code=ErrorCode.LLM_INVALID_RESPONSE
-                    )
-                
-                # Extract code from response
-                code = extract_code_from_response(raw_response)
-                
-                if not code or len(code.strip()) < 5:
-                    raise CodeGenerationError(
-                        message="Could not extract valid code from response",
-                        code=ErrorCode.CODE_EXTRACTION_FAILED,
-                        details=raw_response[:200]
-                    )
-                
-                generation_time = (time.perf_counter() - start_time) * 1000
+                return self._build_result(response.get('response', ''), start_time)
                 
-                llm_logger.performance(
-                    "code_generation",
-                    generation_time,
-                    code_length=len(code),
-                    response_length=len(raw_response)
-                )
-                
-                return GenerationResult(
-                    success=True,
-                    code=code,
-                    raw_response=raw_response,
-                    generation_time_ms=generation_time,
-                    model=self.model
-                )
+            except CodeGenerationError:
+                raise
                 
-            except ollama.ResponseError as e:
-                last_error = f"Ollama error: {str(e)}"
-                llm_logger.warning(
-                    "Ollama response error",
+            except Exception as e:
+                last_error = self._handle_attempt_error(e, attempt)
+        
+        return self._failed_result(start_time, max_retries, last_error)
+    
+    async def generate_async(self, prompt: str, max_retries: int = 2) -> GenerationResult:
+        """
+        Generate pandas code from a prompt without blocking the event loop.
+        
+        Args:
+            prompt: Complete prompt with schema and question
+            max_retries: Number of retries on failure
+            
+        Returns:
+            GenerationResult with generated code
+        """
+        start_time = time.perf_counter()
+        last_error = None
+        
+        for attempt in range(max_retries + 1):
+            try:
+                llm_logger.info(
+                    "Generating code",
                     attempt=attempt + 1,
-                    error=str(e)
+                    prompt_length=len(prompt)
                 )
                 
-            except ConnectionError as e:
-                last_error = f"Connection error: {str(e)}"
-                llm_logger.error(
-                    "Cannot connect to Ollama",
-                    error=str(e)
-                )
-                raise CodeGenerationError(
-                    message="Cannot connect to Ollama. Is it running?",
-                    code=ErrorCode.LLM_CONNECTION_ERROR,
-                    details=str(e)
+                response = await self.async_client.generate(
+                    model=self.model,
+                    prompt=prompt,
+                    options=self._options()
                 )
                 
+                return self._build_result(response.get('response', ''), start_time)
+                
             except CodeGenerationError:
                 raise
                 
             except Exception as e:
-                last_error = str(e)
-                llm_logger.warning(
-                    "Generation attempt failed",
-                    attempt=attempt + 1,
-                    error=str(e)
-                )
+                last_error = self._handle_attempt_error(e, attempt)
+        
+        return self._failed_result(start_time, max_retries, last_error)
+    
+    def _options(self) -> dict:
+        """Get Ollama generation options."""
+        return {
+            'temperature': self.temperature,
+            'num_predict': config.llm.max_tokens,
+        }
+    
+    def _build_result(self, raw_response: str, start_time: float) -> GenerationResult:
+        """
+        Extract code from a raw LLM response.
+        
+        Args:
+            raw_response: Text returned by Ollama
+            start_time: perf_counter value when generation started
+            
+        Returns:
+            Successful GenerationResult
+            
+        Raises:
+            CodeGenerationError: If the response is empty or has no code
+        """
+        if not raw_response:
+            raise CodeGenerationError(
+                message="Empty response from LLM",
+                code=ErrorCode.LLM_INVALID_RESPONSE
+            )
+        
+        # Extract code from response
+        code = extract_code_from_response(raw_response)
+        
+        if not code or len(code.strip()) < 5:
+            raise CodeGenerationError(
+                message="Could not extract valid code from response",
+                code=ErrorCode.CODE_EXTRACTION_FAILED,
+                details=raw_response[:200]
+            )
+        
+        generation_time = (time.perf_counter() - start_time) * 1000
+        
+        llm_logger.performance(
+            "code_generation",
+            generation_time,
+            code_length=len(code),
+            response_length=len(raw_response)
+        )
+        
+        return GenerationResult(
+            success=True,
+            code=code,
+            raw_response=raw_response,
+            generation_time_ms=generation_time,
+            model=self.model
+        )
+    
+    def _handle_attempt_error(self, error: Exception, attempt: int) -> str:
+        """
+        Log a failed generation attempt.
+        
+        Args:
+            error: Exception raised by the attempt
+            attempt: Zero-based attempt number
+            
+        Returns:
+            Error message to report if all retries fail
+            
+        Raises:
+            CodeGenerationError: If Ollama cannot be reached
+        """
+        if isinstance(error, ollama.ResponseError):
+            llm_logger.warning(
+                "Ollama response error",
+                attempt=attempt + 1,
+                error=str(error)
+            )
+            return f"Ollama error: {str(error)}"
+        
+        if isinstance(error, ConnectionError):
+            llm_logger.error(
+                "Cannot connect to Ollama",
+                error=str(error)
+            )
+            raise CodeGenerationError(
+                message="Cannot connect to Ollama. Is it running?",
+                code=ErrorCode.LLM_CONNECTION_ERROR,
+                details=str(error)
+            )
         
-        # All retries failed
+        llm_logger.warning(
+            "Generation attempt failed",
+            attempt=attempt + 1,
+            error=str(error)
+        )
+        return str(error)
+    
+    def _failed_result(
+        self,
+        start_time: float,
+        max_retries: int,
+        last_error: Optional[str]
+    ) -> GenerationResult:
+        """Create the result returned when all retries failed."""
         generation_time = (time.perf_counter() - start_time) * 1000
         
         llm_logger.error(
@@ -207,6 +310,24 @@ class CodeGenerator:
         prompt = build_code_generation_prompt(question, schema)
         return self.generate(prompt)
     
+    async def generate_from_question_async(
+        self,
+        question: str,
+        schema: str
+    ) -> GenerationResult:
+        """
+        Async variant of generate_from_question.
+        
+        Args:
+            question: User's natural language question
+            schema: DataFrame schema description
+            
+        Returns:
+            GenerationResult with generated code
+        """
+        prompt = build_code_generation_prompt(question, schema)
+        return await self.generate_async(prompt)
+    
     def check_connection(self) -> bool:
         """
         Check if Ollama is running and model is available.
@@ -334,11 +455,14 @@ class ResponseGenerator:
     Generates natural language responses from execution results.
     
     Uses the same LLM to format results into human-readable responses.
+    Explanations are cached per (question, code, results), so repeated
+    questions skip the second LLM round-trip.
     """
     
     def __init__(self, code_generator: CodeGenerator = None):
         """Initialize with existing code generator or create new one."""
         self.generator = code_generator or CodeGenerator()
+        self._cache = LRUCache(config.llm.cache_size)
     
     def generate_response(
         self, 
@@ -357,35 +481,81 @@ class ResponseGenerator:
         Returns:
             Natural language explanation
         """
-        from utils import build_response_prompt
-        
-        prompt = build_response_prompt(question, results, code)
+        key = (question, code, results)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
         
         try:
-            result = self.generator.generate(prompt)
-            
-            if result.success:
-                # Clean up the response
-                response = result.raw_response.strip()
-                # Remove any code blocks that might have been included
-                if '```' in response:
-                    # Keep only text before first code block
-                    parts = response.split('```')
-                    response = parts[0].strip()
-                    if len(parts) > 2:
-                        # Add text after last code block
-                        response += '\n' + parts[-1].strip()
-                
-                return response if response else self._fallback_response(results)
-            else:
-                return self._fallback_response(results)
-                
+            result = self.generator.generate(build_response_prompt(question, results, code))
         except Exception as e:
-            llm_logger.warning(
-                "Response generation failed, using fallback",
-                error=str(e)
+            return self._generation_error(e, results)
+        
+        return self._remember(key, self._clean_response(result), results)
+    
+    async def generate_response_async(
+        self,
+        question: str,
+        results: str,
+        code: str
+    ) -> str:
+        """
+        Async variant of generate_response.
+        
+        Args:
+            question: Original user question
+            results: Execution results as string
+            code: The executed code
+            
+        Returns:
+            Natural language explanation
+        """
+        key = (question, code, results)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            result = await self.generator.generate_async(
+                build_response_prompt(question, results, code)
             )
+        except Exception as e:
+            return self._generation_error(e, results)
+        
+        return self._remember(key, self._clean_response(result), results)
+    
+    def _clean_response(self, result: GenerationResult) -> str:
+        """Strip code blocks from an LLM explanation ("" on failure)."""
+        if not result.success:
+            return ""
+        
+        # Clean up the response
+        response = result.raw_response.strip()
+        # Remove any code blocks that might have been included
+        if '```' in response:
+            # Keep only text before first code block
+            parts = response.split('```')
+            response = parts[0].strip()
+            if len(parts) > 2:
+                # Add text after last code block
+                response += '\n' + parts[-1].strip()
+        
+        return response
+    
+    def _remember(self, key: tuple, response: str, results: str) -> str:
+        """Cache a generated explanation, or fall back without caching."""
+        if not response:
             return self._fallback_response(results)
+        self._cache.put(key, response)
+        return response
+    
+    def _generation_error(self, error: Exception, results: str) -> str:
+        """Log a failed LLM call and fall back to the raw results."""
+        llm_logger.warning(
+            "Response generation failed, using fallback",
+            error=str(error)
+        )
+        return self._fallback_response(results)
     
     def _fallback_response(self, results: str) -> str:
         """Generate a basic fallback response."""
@@ -13,9 +13,66 @@ from dataclasses import dataclass, field
 from typing import List, Set, Optional, Tuple
 from enum import Enum
 
-from config import config
-from exceptions import CodeValidationError, SecurityViolationError, ErrorCode
-from logger import security_logger
+from .config import config, ALLOWED_OP, BLOCKED_OP, ALLOWED_VAR
+from .exceptions import CodeValidationError, SecurityViolationError, ErrorCode
+from .logger import security_logger
+
+
+# Regex fallback checks, compiled once (pattern, error message)
+_DANGEROUS_PATTERNS: List[Tuple["re.Pattern[str]", str]] = [
+    (re.compile(pattern, re.IGNORECASE), message)
+    for pattern, message in (
+        (r'__\w+__', "Dunder method access not allowed"),
+        (r'\bexec\s*\(', "exec() is not allowed"),
+        (r'\beval\s*\(', "eval() is not allowed"),
+        (r'\bcompile\s*\(', "compile() is not allowed"),
+        (r'\b__import__\s*\(', "__import__() is not allowed"),
+        (r'\bopen\s*\(', "File operations not allowed"),
+        (r'\bos\.\w+', "os module access not allowed"),
+        (r'\bsys\.\w+', "sys module access not allowed"),
+        (r'\bsubprocess\.\w+', "subprocess module not allowed"),
+        (r'\.read\s*\(', "File read operations not allowed"),
+        (r'\.write\s*\(', "File write operations not allowed"),
+        (r'\bglobals\s*\(', "globals() not allowed"),
+        (r'\blocals\s*\(', "locals() not allowed"),
+        (r'\bgetattr\s*\(', "getattr() not allowed"),
+        (r'\bsetattr\s*\(', "setattr() not allowed"),
+        (r'\blambda\s+\w+', "Lambda functions not allowed"),
+        (r'\blambda\s*:', "Lambda functions not allowed"),
+    )
+]
+
+# Prefilter matching exactly when some pattern above matches, factored by
+# hand so the engine can rule out most positions from the first character.
+# Clean code is cleared in one scan; only code that matches something is
+# checked pattern by pattern (keep in sync with _DANGEROUS_PATTERNS).
+_ANY_DANGEROUS_RE = re.compile(
+    r'__\w+__'
+    r'|\b(?:exec|eval|compile|__import__|open|globals|locals|getattr|setattr)\s*\('
+    r'|\b(?:os|sys|subprocess)\.\w'
+    r'|\.(?:read|write)\s*\('
+    r'|\blambda(?:\s+\w|\s*:)',
+    re.IGNORECASE
+)
+
+# Common temp variable names that are always allowed, fused into one pattern
+_TEMP_VAR_RE = re.compile(
+    r'^(?:'
+    r'[a-z]'            # Single letter vars
+    r'|temp\d*'         # temp, temp1, temp2
+    r'|result\d*'       # result, result1
+    r'|data\d*'         # data, data1
+    r'|grouped\d*'      # grouped, grouped1
+    r'|filtered\d*'     # filtered, filtered1
+    r'|subset\d*'       # subset, subset1
+    r'|stats\d*'        # stats, stats1
+    r'|summary\d*'      # summary, summary1
+    r'|[xy]\d*'         # x, y, x1, y1
+    r'|idx\d*'          # idx, idx1
+    r'|row\d*'          # row, row1
+    r'|col\d*'          # col, col1
+    r')$'
+)
 
 
 class ValidationStatus(Enum):
@@ -122,6 +179,8 @@ class CodeValidator:
         self.blocked_ops = config.security.blocked_operations
         self.blocked_modules = config.security.blocked_modules
         self.allowed_vars = config.security.allowed_variables
+        self.blocked_ops_len_mask = config.security.blocked_operations_len_mask
+        self.classify = config.security.classify
     
     def validate(self, code: str) -> ValidationResult:
         """
@@ -193,8 +252,12 @@ class CodeValidator:
         # Layer 4: Check denylist (blocked operations)
         all_operations = set(visitor.calls + visitor.attributes + visitor.names)
         
+        blocked_mask = self.blocked_ops_len_mask
         for op in all_operations:
-            if op in self.blocked_ops:
+            # Length prefilter: skip the hash probe when no blocked name has this length
+            if not (blocked_mask >> (len(op) & 63)) & 1:
+                continue
+            if self.classify(op) & BLOCKED_OP:
                 blocked.append(op)
                 security_logger.security(
                     "Blocked operation detected",
@@ -273,12 +336,17 @@ class CodeValidator:
         # Normalize operation name
         op_lower = operation.lower()
         
+        # Single table lookup per spelling gives every category at once
+        token_class = self.classify(operation)
+        if op_lower != operation:
+            token_class |= self.classify(op_lower)
+        
         # Check denylist first (highest priority)
-        if operation in self.blocked_ops or op_lower in self.blocked_ops:
+        if token_class & BLOCKED_OP:
             return ValidationStatus.DENIED
         
         # Check allowlist
-        if operation in self.allowed_ops or op_lower in self.allowed_ops:
+        if token_class & ALLOWED_OP:
             return ValidationStatus.ALLOWED
         
         # Check if it's a common Python builtin that's safe
@@ -313,32 +381,15 @@ class CodeValidator:
         """
         errors = []
         
-        dangerous_patterns = [
-            (r'__\w+__', "Dunder method access not allowed"),
-            (r'\bexec\s*\(', "exec() is not allowed"),
-            (r'\beval\s*\(', "eval() is not allowed"),
-            (r'\bcompile\s*\(', "compile() is not allowed"),
-            (r'\b__import__\s*\(', "__import__() is not allowed"),
-            (r'\bopen\s*\(', "File operations not allowed"),
-            (r'\bos\.\w+', "os module access not allowed"),
-            (r'\bsys\.\w+', "sys module access not allowed"),
-            (r'\bsubprocess\.\w+', "subprocess module not allowed"),
-            (r'\.read\s*\(', "File read operations not allowed"),
-            (r'\.write\s*\(', "File write operations not allowed"),
-            (r'\bglobals\s*\(', "globals() not allowed"),
-            (r'\blocals\s*\(', "locals() not allowed"),
-            (r'\bgetattr\s*\(', "getattr() not allowed"),
-            (r'\bsetattr\s*\(', "setattr() not allowed"),
-            (r'\blambda\s+\w+', "Lambda functions not allowed"),
-            (r'\blambda\s*:', "Lambda functions not allowed"),
-        ]
+        if not _ANY_DANGEROUS_RE.search(code):
+            return errors
         
-        for pattern, message in dangerous_patterns:
-            if re.search(pattern, code, re.IGNORECASE):
+        for pattern, message in _DANGEROUS_PATTERNS:
+            if pattern.search(code):
                 errors.append(message)
                 security_logger.security(
                     f"Dangerous pattern detected: {message}",
-                    pattern=pattern
+                    pattern=pattern.pattern
                 )
         
         return errors
@@ -358,30 +409,13 @@ class CodeValidator:
         # These are always allowed
         always_allowed = {'df', 'pd', 'np', 'True', 'False', 'None'}
         
-        # Common temp variable patterns are allowed
-        temp_patterns = [
-            r'^[a-z]$',          # Single letter vars
-            r'^temp\d*$',        # temp, temp1, temp2
-            r'^result\d*$',      # result, result1
-            r'^data\d*$',        # data, data1
-            r'^grouped\d*$',     # grouped, grouped1
-            r'^filtered\d*$',    # filtered, filtered1
-            r'^subset\d*$',      # subset, subset1
-            r'^stats\d*$',       # stats, stats1
-            r'^summary\d*$',     # summary, summary1
-            r'^[xy]\d*$',        # x, y, x1, y1
-            r'^idx\d*$',         # idx, idx1
-            r'^row\d*$',         # row, row1
-            r'^col\d*$',         # col, col1
-        ]
-        
         for name in names:
             # Skip allowed names
-            if name in always_allowed or name in self.allowed_vars:
+            if name in always_allowed or self.classify(name) & ALLOWED_VAR:
                 continue
             
             # Check temp patterns
-            if any(re.match(p, name) for p in temp_patterns):
+            if _TEMP_VAR_RE.match(name):
                 continue
             
             # Check if it might be a column string reference
@@ -7,12 +7,143 @@ All values are designed for 100% offline operation.
 Developer: aliawada127001@outlook.com
 """
 
+import sys
 from dataclasses import dataclass, field
-from typing import FrozenSet
+from functools import cached_property
+from typing import Dict, FrozenSet
 from pathlib import Path
 
 
-@dataclass(frozen=True)
+# dataclass(slots=True) needs Python 3.10+; older versions keep __dict__
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+# Security token sets are built once at import and shared by every
+# SecurityConfig instance (the dataclass is frozen, so sharing is safe).
+
+# Allowed pandas/numpy operations (allowlist)
+_ALLOWED_OPS: FrozenSet[str] = frozenset({
+    # DataFrame operations
+    'groupby', 'agg', 'aggregate', 'apply', 'transform', 'pipe',
+    # Statistical operations
+    'mean', 'sum', 'count', 'std', 'var', 'min', 'max',
+    'median', 'quantile', 'describe', 'mode', 'sem', 'skew', 'kurt',
+    # Filtering & Selection
+    'filter', 'query', 'loc', 'iloc', 'isin', 'contains',
+    'between', 'isna', 'notna', 'dropna', 'fillna', 'where', 'mask',
+    # Transformations
+    'merge', 'join', 'concat', 'pivot', 'pivot_table', 'melt',
+    'stack', 'unstack', 'explode', 'crosstab',
+    # Analysis
+    'corr', 'cov', 'value_counts', 'unique', 'nunique', 'duplicated',
+    # Sorting & Indexing
+    'sort_values', 'sort_index', 'reset_index', 'set_index', 'reindex',
+    # Selection
+    'head', 'tail', 'sample', 'drop_duplicates', 'nlargest', 'nsmallest',
+    # String operations
+    'str', 'lower', 'upper', 'strip', 'replace', 'split',
+    # DateTime operations
+    'dt', 'year', 'month', 'day', 'hour', 'minute',
+    # Type operations
+    'astype', 'to_numeric', 'to_datetime',
+    # Aggregation aliases
+    'first', 'last', 'nth', 'size',
+    # Comparison
+    'eq', 'ne', 'lt', 'le', 'gt', 'ge',
+    # Math
+    'abs', 'round', 'floor', 'ceil', 'clip',
+    # Boolean
+    'any', 'all', 'bool',
+    # Shape
+    'shape', 'columns', 'index', 'values', 'dtypes', 'info',
+    'len', 'copy', 'rename', 'assign',
+})
+
+
+# Blocked operations (denylist) - security critical
+_BLOCKED_OPS: FrozenSet[str] = frozenset({
+    # Code execution (critical)
+    'eval', 'exec', 'compile', '__import__', 'execfile',
+    'input', 'raw_input',
+    # File operations
+    'open', 'file', 'read', 'write', 'remove', 'delete',
+    'rmdir', 'mkdir', 'chmod', 'chown', 'unlink', 'rename',
+    'listdir', 'walk', 'glob', 'scandir',
+    # System operations
+    'system', 'popen', 'call', 'run', 'spawn', 'kill',
+    'fork', 'wait', 'exit', 'quit', 'abort',
+    # Network operations
+    'socket', 'urllib', 'requests', 'http', 'ftp', 'smtp',
+    'connect', 'send', 'recv', 'bind', 'listen',
+    # Dangerous builtins
+    '__builtins__', '__globals__', '__locals__', '__dict__',
+    '__class__', '__bases__', '__subclasses__', '__getattribute__',
+    '__setattr__', '__delattr__', '__code__', '__func__',
+    # Reflection/metaprogramming
+    'getattr', 'setattr', 'delattr', 'hasattr', 'vars', 'dir',
+    'globals', 'locals', 'type', 'object',
+    # Pickle/serialization (code execution risk)
+    'pickle', 'marshal', 'dill', 'shelve', 'load', 'loads', 'dump', 'dumps',
+    # Subprocess
+    'subprocess', 'Popen', 'check_output', 'check_call',
+    # Import-related
+    'importlib', '__loader__', '__spec__',
+})
+
+
+# Blocked modules (denylist)
+_BLOCKED_MODULES: FrozenSet[str] = frozenset({
+    'os', 'sys', 'subprocess', 'shutil', 'pickle', 'marshal',
+    'socket', 'urllib', 'requests', 'http', 'ftplib', 'smtplib',
+    'sqlite3', 'ctypes', 'multiprocessing', 'threading', 'asyncio',
+    'importlib', 'builtins', 'code', 'codeop', 'compile',
+    'gc', 'inspect', 'traceback', 'linecache', 'tempfile',
+    'pathlib', 'io', 'zipfile', 'tarfile', 'gzip', 'bz2',
+})
+
+
+# Allowed variable names in execution context
+_ALLOWED_VARS: FrozenSet[str] = frozenset({
+    'df', 'pd', 'np', 'result', 'filtered', 'grouped', 'merged',
+    'temp', 'data', 'subset', 'output', 'stats', 'summary',
+})
+
+
+def _length_mask(tokens: FrozenSet[str]) -> int:
+    """Build a 64-bit bitmap with bit ``len(token) & 63`` set for each token."""
+    mask = 0
+    for token in tokens:
+        mask |= 1 << (len(token) & 63)
+    return mask
+
+
+# Token categories (bit flags) returned by SecurityConfig.classify
+ALLOWED_OP = 1
+BLOCKED_OP = 2
+BLOCKED_MODULE = 4
+ALLOWED_VAR = 8
+
+
+def _build_token_classes(
+    allowed_ops: FrozenSet[str],
+    blocked_ops: FrozenSet[str],
+    blocked_modules: FrozenSet[str],
+    allowed_vars: FrozenSet[str],
+) -> Dict[str, int]:
+    """Merge the security sets into one token -> category-bitmask table."""
+    table: Dict[str, int] = {}
+    for tokens, category in (
+        (allowed_ops, ALLOWED_OP),
+        (blocked_ops, BLOCKED_OP),
+        (blocked_modules, BLOCKED_MODULE),
+        (allowed_vars, ALLOWED_VAR),
+    ):
+        for token in tokens:
+            table[token] = table.get(token, 0) | category
+    return table
+
+
+@dataclass(frozen=True, **_SLOTS)
 class LLMConfig:
     """Ollama/DeepSeek Coder configuration."""
     model_name: str = "deepseek-coder:6.7b"
@@ -20,9 +151,11 @@ class LLMConfig:
     temperature: float = 0.1  # Low for deterministic code generation
     max_tokens: int = 2048
     timeout: int = 120  # seconds
+    max_concurrency: int = 8  # in-flight async generation requests
+    cache_size: int = 256  # generated code / responses kept for repeated questions
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_SLOTS)
 class SecurityConfig:
     """Security settings for code validation and execution."""
     
@@ -34,98 +167,55 @@ class SecurityConfig:
     max_memory_mb: int = 512
     
     # Allowed pandas/numpy operations (allowlist)
-    allowed_operations: FrozenSet[str] = field(default_factory=lambda: frozenset({
-        # DataFrame operations
-        'groupby', 'agg', 'aggregate', 'apply', 'transform', 'pipe',
-        # Statistical operations
-        'mean', 'sum', 'count', 'std', 'var', 'min', 'max',
-        'median', 'quantile', 'describe', 'mode', 'sem', 'skew', 'kurt',
-        # Filtering & Selection
-        'filter', 'query', 'loc', 'iloc', 'isin', 'contains',
-        'between', 'isna', 'notna', 'dropna', 'fillna', 'where', 'mask',
-        # Transformations
-        'merge', 'join', 'concat', 'pivot', 'pivot_table', 'melt',
-        'stack', 'unstack', 'explode', 'crosstab',
-        # Analysis
-        'corr', 'cov', 'value_counts', 'unique', 'nunique', 'duplicated',
-        # Sorting & Indexing
-        'sort_values', 'sort_index', 'reset_index', 'set_index', 'reindex',
-        # Selection
-        'head', 'tail', 'sample', 'drop_duplicates', 'nlargest', 'nsmallest',
-        # String operations
-        'str', 'lower', 'upper', 'strip', 'replace', 'split',
-        # DateTime operations
-        'dt', 'year', 'month', 'day', 'hour', 'minute',
-        # Type operations
-        'astype', 'to_numeric', 'to_datetime',
-        # Aggregation aliases
-        'first', 'last', 'nth', 'size',
-        # Comparison
-        'eq', 'ne', 'lt', 'le', 'gt', 'ge',
-        # Math
-        'abs', 'round', 'floor', 'ceil', 'clip',
-        # Boolean
-        'any', 'all', 'bool',
-        # Shape
-        'shape', 'columns', 'index', 'values', 'dtypes', 'info',
-        'len', 'copy', 'rename', 'assign',
-    }))
+    allowed_operations: FrozenSet[str] = field(default_factory=lambda: _ALLOWED_OPS)
     
     # Blocked operations (denylist) - security critical
-    blocked_operations: FrozenSet[str] = field(default_factory=lambda: frozenset({
-        # Code execution (critical)
-        'eval', 'exec', 'compile', '__import__', 'execfile',
-        'input', 'raw_input',
-        # File operations
-        'open', 'file', 'read', 'write', 'remove', 'delete',
-        'rmdir', 'mkdir', 'chmod', 'chown', 'unlink', 'rename',
-        'listdir', 'walk', 'glob', 'scandir',
-        # System operations
-        'system', 'popen', 'call', 'run', 'spawn', 'kill',
-        'fork', 'wait', 'exit', 'quit', 'abort',
-        # Network operations
-        'socket', 'urllib', 'requests', 'http', 'ftp', 'smtp',
-        'connect', 'send', 'recv', 'bind', 'listen',
-        # Dangerous builtins
-        '__builtins__', '__globals__', '__locals__', '__dict__',
-        '__class__', '__bases__', '__subclasses__', '__getattribute__',
-        '__setattr__', '__delattr__', '__code__', '__func__',
-        # Reflection/metaprogramming
-        'getattr', 'setattr', 'delattr', 'hasattr', 'vars', 'dir',
-        'globals', 'locals', 'type', 'object',
-        # Pickle/serialization (code execution risk)
-        'pickle', 'marshal', 'dill', 'shelve', 'load', 'loads', 'dump', 'dumps',
-        # Subprocess
-        'subprocess', 'Popen', 'check_output', 'check_call',
-        # Import-related
-        'importlib', '__loader__', '__spec__',
-    }))
+    blocked_operations: FrozenSet[str] = field(default_factory=lambda: _BLOCKED_OPS)
     
     # Blocked modules (denylist)
-    blocked_modules: FrozenSet[str] = field(default_factory=lambda: frozenset({
-        'os', 'sys', 'subprocess', 'shutil', 'pickle', 'marshal',
-        'socket', 'urllib', 'requests', 'http', 'ftplib', 'smtplib',
-        'sqlite3', 'ctypes', 'multiprocessing', 'threading', 'asyncio',
-        'importlib', 'builtins', 'code', 'codeop', 'compile',
-        'gc', 'inspect', 'traceback', 'linecache', 'tempfile',
-        'pathlib', 'io', 'zipfile', 'tarfile', 'gzip', 'bz2',
-    }))
+    blocked_modules: FrozenSet[str] = field(default_factory=lambda: _BLOCKED_MODULES)
     
     # Allowed variable names in execution context
-    allowed_variables: FrozenSet[str] = field(default_factory=lambda: frozenset({
-        'df', 'pd', 'np', 'result', 'filtered', 'grouped', 'merged',
-        'temp', 'data', 'subset', 'output', 'stats', 'summary',
-    }))
+    allowed_variables: FrozenSet[str] = field(default_factory=lambda: _ALLOWED_VARS)
+    
+    # Length bitmap of blocked_operations (see _length_mask): validators
+    # skip the lookup for tokens whose length bit is unset. Derived from
+    # the instance's own set so a custom denylist is never bypassed.
+    blocked_operations_len_mask: int = field(init=False, repr=False, compare=False)
+    
+    # One hash probe answers every set-membership question for a token
+    # (see classify); built from the sets above in __post_init__
+    _token_class: Dict[str, int] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        object.__setattr__(
+            self, 'blocked_operations_len_mask', _length_mask(self.blocked_operations)
+        )
+        object.__setattr__(self, '_token_class', _build_token_classes(
+            self.allowed_operations,
+            self.blocked_operations,
+            self.blocked_modules,
+            self.allowed_variables,
+        ))
+    
+    def classify(self, token: str) -> int:
+        """Get the category bitmask (ALLOWED_OP, BLOCKED_OP, ...) for a token."""
+        return self._token_class.get(token, 0)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_SLOTS)
 class DataConfig:
     """Data file configuration."""
     data_file: str = "Students_Dataset.xlsx"
     sheet_name: str = "Sheet1"  # Default sheet
+    
+    # Result display limits (text passed to the response LLM)
+    max_display_rows: int = 20  # Longer results show head and tail halves
+    max_display_cols: int = 20
+    csv_display_threshold: int = 200  # Above this, head/tail are written as CSV
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_SLOTS)
 class UIConfig:
     """Streamlit UI configuration."""
     page_title: str = "Educational Data Chatbot"
@@ -152,7 +242,7 @@ class AppConfig:
     # Application paths - project root is parent of src/
     base_path: Path = field(default_factory=lambda: Path(__file__).parent.parent)
     
-    @property
+    @cached_property
     def data_path(self) -> Path:
         return self.base_path / "data" / self.data.data_file
 
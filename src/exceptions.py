@@ -7,11 +7,12 @@ with helpful messages and error codes.
 Developer: aliawada127001@outlook.com
 """
 
-from enum import Enum
+from enum import IntEnum, unique
 from typing import Optional, List
 
 
-class ErrorCode(Enum):
+@unique
+class ErrorCode(IntEnum):
     """Error codes for categorizing exceptions."""
     # Code Generation Errors (1xx)
     LLM_CONNECTION_ERROR = 101
@@ -58,10 +59,12 @@ class ChatbotError(Exception):
         self.details = details
         # User-friendly message (safe to display)
         self.user_message = user_message or message
+        # Formatted once; exceptions are often logged/str()'d several times
+        self._str = f"[{code.name}] {message}"
         super().__init__(self.message)
     
     def __str__(self) -> str:
-        return f"[{self.code.name}] {self.message}"
+        return self._str
 
 
 class CodeGenerationError(ChatbotError):
@@ -7,23 +7,85 @@ Question → Code Generation → Validation → Execution → Response
 Developer: aliawada127001@outlook.com
 """
 
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
 import time
-from dataclasses import dataclass, field
-from typing import Any, Optional, Dict
+import weakref
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Optional, Dict, Tuple, Union, TYPE_CHECKING
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
-from config import config
-from exceptions import (
+from .config import config
+from .exceptions import (
     ChatbotError, CodeGenerationError, CodeValidationError,
     CodeExecutionError, DataLoadError, InputValidationError
 )
-from logger import app_logger
-from utils import extract_schema, sanitize_input, format_result_for_display
-from code_generator import get_code_generator, get_response_generator, GenerationResult
-from code_validator import validate_code, ValidationResult
-from code_executor import execute_code, ExecutionResult
+from .logger import app_logger
+from .utils import get_cached_schema, sanitize_input, format_result_for_display, LRUCache
+
+# The LLM client, validator and executor are imported on first use so that
+# importing this module (e.g. for a health check) stays cheap
+if TYPE_CHECKING:
+    from .code_generator import GenerationResult
+    from .code_validator import ValidationResult
+    from .code_executor import ExecutionResult
+
+# Folds line breaks and tabs so a logged question stays on one line
+_LOG_TABLE = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
+
+# Parquet cache key, stored in the file's key-value metadata together with
+# the sheet name. Bump the version whenever loading or dtype handling
+# changes what the cached frame holds, so older files are not reused.
+_DATA_CACHE_KEY_FIELD = b'chatbot.cache_key'
+_DATA_CACHE_VERSION = 2
+
+# Caps in-flight async requests to Ollama. Semaphores belong to one event
+# loop, so each loop that calls process_question_async gets its own.
+_llm_gates: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _write_atomic(path: Path, write: Callable[[str], None], failure: str) -> None:
+    """
+    Write a cache file through a temporary file and os.replace (best effort).
+    
+    Concurrent readers see either the old file or the complete new one.
+    
+    Args:
+        path: Final location of the file
+        write: Callback that writes the full contents to the given path
+        failure: Message logged if the write fails
+    """
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+        os.close(fd)
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        app_logger.warning(failure, path=str(path), error=str(e))
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def _llm_gate() -> asyncio.Semaphore:
+    """Get the concurrency gate for the running event loop."""
+    loop = asyncio.get_running_loop()
+    gate = _llm_gates.get(loop)
+    if gate is None:
+        gate = _llm_gates[loop] = asyncio.Semaphore(config.llm.max_concurrency)
+    return gate
 
 
 @dataclass
@@ -52,14 +114,29 @@ class DataManager:
     """
     Manages data loading and caching.
     
-    Implements lazy loading and caching for the DataFrame.
+    Implements lazy loading and caching for the DataFrame. The cache is
+    keyed on the data file's modification time, so edits to the file are
+    picked up on the next access without re-parsing it on every request.
     """
     
     def __init__(self, data_path: Path = None):
         """Initialize with data file path."""
         self.data_path = data_path or config.data_path
+        self.sheet_name = config.data.sheet_name
         self._df: Optional[pd.DataFrame] = None
         self._schema: Optional[str] = None
+        self._schema_key: Optional[tuple] = None
+        self._mtime: Optional[float] = None
+        # Columnar copy of the workbook, rebuilt whenever the workbook changes
+        self.cache_path = self.data_path.with_suffix('.parquet')
+        self.schema_cache_path = self.data_path.with_suffix('.schema.txt')
+    
+    def _source_mtime(self) -> Optional[float]:
+        """Get the data file's modification time, or None if unavailable."""
+        try:
+            return self.data_path.stat().st_mtime
+        except OSError:
+            return None
     
     def load_data(self, force_reload: bool = False) -> pd.DataFrame:
         """
@@ -71,17 +148,24 @@ class DataManager:
         Returns:
             Loaded DataFrame
         """
-        if self._df is None or force_reload:
+        mtime = self._source_mtime()
+        stale = mtime is not None and mtime != self._mtime
+        
+        if self._df is None or force_reload or stale:
             try:
                 app_logger.info(
                     "Loading data file",
                     path=str(self.data_path)
                 )
                 
-                self._df = pd.read_excel(
-                    self.data_path,
-                    sheet_name=config.data.sheet_name
-                )
+                # The Parquet cache already holds the narrowed dtypes
+                df = self._read_cache(mtime)
+                if df is None:
+                    df = self._optimize_dtypes(self._read_source())
+                    self._write_cache(df)
+                self._df = df
+                self._mtime = mtime
+                self._schema = None  # Schema belongs to the previous frame
                 
                 app_logger.info(
                     "Data loaded successfully",
@@ -102,19 +186,168 @@ class DataManager:
         
         return self._df
     
+    def _read_source(self) -> pd.DataFrame:
+        """Read the Excel workbook, preferring the calamine engine."""
+        try:
+            return pd.read_excel(
+                self.data_path,
+                sheet_name=self.sheet_name,
+                engine='calamine'
+            )
+        except (ImportError, ValueError):
+            # python-calamine not installed (or pandas too old for it);
+            # pandas already opens the workbook read-only with openpyxl
+            return pd.read_excel(
+                self.data_path,
+                sheet_name=self.sheet_name,
+                engine='openpyxl'
+            )
+    
+    @staticmethod
+    def _optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Narrow integer columns to cut memory and speed up grouping.
+        
+        int64 columns whose values fit are stored as int32. Narrower
+        integer types are avoided to keep overflow unlikely, but int32
+        arithmetic in generated code can still wrap silently (e.g.
+        squaring 50000). Text columns are left as strings: categoricals would
+        make value_counts/groupby in generated code report unused
+        categories (zero counts, or NaN rows on pandas 2.x).
+        
+        Args:
+            df: Freshly loaded DataFrame
+            
+        Returns:
+            The same DataFrame with narrowed dtypes
+        """
+        int_cols = df.select_dtypes(include='int64').columns
+        if len(int_cols):
+            bounds = df[int_cols].agg(['min', 'max'])
+            info = np.iinfo(np.int32)
+            fits = [
+                col for col in int_cols
+                if bounds.at['min', col] >= info.min and bounds.at['max', col] <= info.max
+            ]
+            if fits:
+                df[fits] = df[fits].astype(np.int32)
+        
+        return df
+    
+    def _data_cache_key(self) -> bytes:
+        """Key identifying what the Parquet cache must have been built from."""
+        return f"v{_DATA_CACHE_VERSION}:{self.sheet_name}".encode('utf-8')
+    
+    def _read_cache(self, source_mtime: Optional[float]) -> Optional[pd.DataFrame]:
+        """
+        Read the Parquet cache if it is at least as new as the workbook.
+        
+        Args:
+            source_mtime: Modification time of the Excel file
+            
+        Returns:
+            Cached DataFrame, or None if missing, stale, written for another
+            sheet or loader version, or unreadable
+        """
+        try:
+            if source_mtime is None or self.cache_path.stat().st_mtime < source_mtime:
+                return None
+            import pyarrow.parquet as pq
+            metadata = pq.read_schema(self.cache_path).metadata or {}
+            if metadata.get(_DATA_CACHE_KEY_FIELD) != self._data_cache_key():
+                return None
+            return pd.read_parquet(self.cache_path, engine='pyarrow')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            app_logger.warning(
+                "Could not read data cache",
+                path=str(self.cache_path),
+                error=str(e)
+            )
+            return None
+    
+    def _write_cache(self, df: pd.DataFrame) -> None:
+        """Write the Parquet cache, tagged with its key (best effort; pyarrow is optional)."""
+        def write(path: str) -> None:
+            # What df.to_parquet does, plus the cache key in the metadata
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df)
+            metadata = dict(table.schema.metadata or {})
+            metadata[_DATA_CACHE_KEY_FIELD] = self._data_cache_key()
+            pq.write_table(table.replace_schema_metadata(metadata), path, compression='zstd')
+        
+        _write_atomic(self.cache_path, write, "Could not write data cache")
+    
+    def _schema_header(self, key: tuple) -> str:
+        """First line of the schema cache: a digest of the sheet and schema key."""
+        digest = hashlib.sha1(repr((self.sheet_name, key)).encode('utf-8')).hexdigest()
+        return f"# schema-key: {digest}"
+    
+    def _read_schema_cache(self, key: tuple) -> Optional[str]:
+        """
+        Read the schema written for the currently loaded workbook.
+        
+        Args:
+            key: (shape, columns, dtypes) of the loaded frame
+            
+        Returns:
+            Cached schema, or None if missing, stale, written for another
+            sheet or a frame with different columns/dtypes, or unreadable
+        """
+        try:
+            if self._mtime is None or self.schema_cache_path.stat().st_mtime < self._mtime:
+                return None
+            header, _, schema = self.schema_cache_path.read_text(encoding='utf-8').partition('\n')
+            if header != self._schema_header(key):
+                return None
+            return schema or None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            app_logger.warning(
+                "Could not read schema cache",
+                path=str(self.schema_cache_path),
+                error=str(e)
+            )
+            return None
+    
+    def _write_schema_cache(self, schema: str, key: tuple) -> None:
+        """Write the schema next to the workbook (best effort, atomically)."""
+        if self._mtime is None:
+            return
+        text = f"{self._schema_header(key)}\n{schema}"
+        _write_atomic(
+            self.schema_cache_path,
+            lambda path: Path(path).write_text(text, encoding='utf-8'),
+            "Could not write schema cache"
+        )
+    
     def get_schema(self, force_refresh: bool = False) -> str:
         """
         Get or generate DataFrame schema description.
         
+        A schema generated from the workbook is also kept on disk, so a new
+        DataManager for an unchanged file skips the column scan entirely.
+        
         Args:
             force_refresh: Force schema regeneration
             
         Returns:
             Schema description string
         """
-        if self._schema is None or force_refresh:
-            df = self.load_data()
-            self._schema = extract_schema(df)
+        df = self.load_data()
+        # Regenerate if the frame's shape, columns or dtypes changed
+        key = (df.shape, tuple(df.columns), tuple(df.dtypes.astype(str)))
+        
+        if self._schema is None or force_refresh or key != self._schema_key:
+            schema = None if force_refresh else self._read_schema_cache(key)
+            if schema is None:
+                schema = get_cached_schema(df, refresh=force_refresh)
+                self._write_schema_cache(schema, key)
+            self._schema = schema
+            self._schema_key = key
         
         return self._schema
     
@@ -139,6 +372,10 @@ class QueryProcessor:
     3. Code validation (security)
     4. Code execution (sandboxed)
     5. Response formatting (LLM)
+    
+    Generated code is cached per (question, schema) once it has validated
+    and executed successfully, so repeated questions against unchanged data
+    skip the code-generation LLM call. Code that later fails is evicted.
     """
     
     def __init__(self, data_manager: DataManager = None):
@@ -146,11 +383,14 @@ class QueryProcessor:
         self.data_manager = data_manager or DataManager()
         self._code_generator = None
         self._response_generator = None
+        self._gen_cache = LRUCache(config.llm.cache_size)
+        self._max_input_len = config.security.max_input_length
     
     @property
     def code_generator(self):
         """Lazy load code generator."""
         if self._code_generator is None:
+            from .code_generator import get_code_generator
             self._code_generator = get_code_generator()
         return self._code_generator
     
@@ -158,6 +398,7 @@ class QueryProcessor:
     def response_generator(self):
         """Lazy load response generator."""
         if self._response_generator is None:
+            from .code_generator import get_response_generator
             self._response_generator = get_response_generator()
         return self._response_generator
     
@@ -171,116 +412,259 @@ class QueryProcessor:
         Returns:
             QueryResult with answer, data, and metadata
         """
-        start_time = time.perf_counter()
-        warnings = []
-        
-        app_logger.info(
-            "Processing question",
-            question=question[:100]
-        )
+        start_time = self._start(question)
         
         try:
             # Step 1: Input validation
             question = self._validate_input(question)
             
             # Step 2: Load data and schema
-            df = self.data_manager.df
-            schema = self.data_manager.schema
+            df, schema = self._load_data_and_schema()
             
             # Step 3: Generate code
             gen_result = self._generate_code(question, schema)
-            
             if not gen_result.success:
-                return self._create_error_result(
-                    question=question,
-                    error="Could not generate analysis code",
-                    error_code="GENERATION_FAILED",
-                    start_time=start_time
-                )
-            
-            # Step 4: Validate code
-            try:
-                val_result = self._validate_code(gen_result.code)
-                warnings.extend(val_result.warnings)
-            except (CodeValidationError, Exception) as e:
-                return self._create_error_result(
-                    question=question,
-                    error=str(e.user_message if hasattr(e, 'user_message') else e),
-                    error_code="VALIDATION_FAILED",
-                    start_time=start_time
-                )
+                return self._generation_failed(question, start_time)
             
-            # Step 5: Execute code
-            exec_result = self._execute_code(val_result.sanitized_code, df)
-            
-            if not exec_result.success:
-                return self._create_error_result(
-                    question=question,
-                    error=exec_result.error or "Execution failed",
-                    error_code="EXECUTION_FAILED",
-                    start_time=start_time,
-                    code=gen_result.code
-                )
+            # Steps 4-5: Validate and execute code
+            outcome = self._validate_and_execute(question, schema, gen_result, df, start_time)
+            if isinstance(outcome, QueryResult):
+                return outcome
+            exec_result, warnings = outcome
             
             # Step 6: Format response
             formatted_result, result_type = format_result_for_display(exec_result.result)
             answer = self._generate_response(question, formatted_result, gen_result.code)
             
-            total_time = (time.perf_counter() - start_time) * 1000
+            return self._success_result(
+                question, answer, result_type, gen_result, exec_result, warnings, start_time
+            )
+            
+        except Exception as e:
+            return self._error_from_exception(question, e, start_time)
+    
+    async def process_question_async(self, question: str) -> QueryResult:
+        """
+        Process a user question without blocking the event loop.
+        
+        Runs the same steps as process_question. LLM calls from concurrent
+        requests overlap (up to ``config.llm.max_concurrency`` at once),
+        while data loading, validation and pandas execution run in worker
+        threads.
+        
+        Args:
+            question: User's natural language question
+            
+        Returns:
+            QueryResult with answer, data, and metadata
+        """
+        start_time = self._start(question)
+        
+        try:
+            # Step 1: Input validation
+            question = self._validate_input(question)
             
-            app_logger.query(question, success=True, duration_ms=total_time)
+            # Step 2: Load data and schema
+            df, schema = await asyncio.to_thread(self._load_data_and_schema)
             
-            return QueryResult(
-                success=True,
-                question=question,
-                answer=answer,
-                data=exec_result.result,
-                data_type=result_type,
-                code=gen_result.code,
-                execution_time_ms=exec_result.execution_time_ms,
-                generation_time_ms=gen_result.generation_time_ms,
-                total_time_ms=total_time,
-                warnings=warnings
+            # Step 3: Generate code
+            gen_result = await self._generate_code_async(question, schema)
+            if not gen_result.success:
+                return self._generation_failed(question, start_time)
+            
+            # Steps 4-5: Validate and execute code
+            outcome = await asyncio.to_thread(
+                self._validate_and_execute, question, schema, gen_result, df, start_time
             )
+            if isinstance(outcome, QueryResult):
+                return outcome
+            exec_result, warnings = outcome
             
-        except ChatbotError as e:
+            # Step 6: Format response
+            formatted_result, result_type = format_result_for_display(exec_result.result)
+            async with _llm_gate():
+                answer = await self._generate_response_async(
+                    question, formatted_result, gen_result.code
+                )
+            
+            return self._success_result(
+                question, answer, result_type, gen_result, exec_result, warnings, start_time
+            )
+            
+        except Exception as e:
+            return self._error_from_exception(question, e, start_time)
+    
+    def _start(self, question: str) -> float:
+        """Log an incoming question and return the pipeline start time."""
+        start_time = time.perf_counter()
+        app_logger.info(
+            "Processing question",
+            question=question[:100].translate(_LOG_TABLE)
+        )
+        return start_time
+    
+    def _load_data_and_schema(self) -> Tuple[pd.DataFrame, str]:
+        """Load the DataFrame and its schema together."""
+        df = self.data_manager.load_data()
+        return df, self.data_manager.get_schema()
+    
+    def _validate_and_execute(
+        self,
+        question: str,
+        schema: str,
+        gen_result: GenerationResult,
+        df: pd.DataFrame,
+        start_time: float
+    ) -> Union[Tuple[ExecutionResult, list], QueryResult]:
+        """
+        Validate and execute generated code (pipeline steps 4-5).
+        
+        Code that runs successfully is cached for the question; cached code
+        that fails either step is evicted.
+        
+        Returns:
+            (execution result, validation warnings) on success, otherwise
+            the error QueryResult to return
+        """
+        try:
+            val_result = self._validate_code(gen_result.code)
+        except (CodeValidationError, Exception) as e:
+            self._forget_code(question, schema)
             return self._create_error_result(
                 question=question,
-                error=e.user_message,
-                error_code=e.code.name if hasattr(e, 'code') else "ERROR",
+                error=str(e.user_message if hasattr(e, 'user_message') else e),
+                error_code="VALIDATION_FAILED",
                 start_time=start_time
             )
-            
-        except Exception as e:
-            app_logger.error(
-                "Unexpected error processing question",
-                error=str(e),
-                error_type=type(e).__name__
+        
+        exec_result = self._execute_code(val_result.sanitized_code, df)
+        
+        if not exec_result.success:
+            self._forget_code(question, schema)
+            return self._create_error_result(
+                question=question,
+                error=exec_result.error or "Execution failed",
+                error_code="EXECUTION_FAILED",
+                start_time=start_time,
+                code=gen_result.code
             )
+        
+        self._remember_code(question, schema, gen_result)
+        return exec_result, list(val_result.warnings)
+    
+    def _generation_failed(self, question: str, start_time: float) -> QueryResult:
+        """Create the result for a failed code-generation step."""
+        return self._create_error_result(
+            question=question,
+            error="Could not generate analysis code",
+            error_code="GENERATION_FAILED",
+            start_time=start_time
+        )
+    
+    def _success_result(
+        self,
+        question: str,
+        answer: str,
+        result_type: str,
+        gen_result: GenerationResult,
+        exec_result: ExecutionResult,
+        warnings: list,
+        start_time: float
+    ) -> QueryResult:
+        """Create the result for a completed pipeline run."""
+        total_time = (time.perf_counter() - start_time) * 1000
+        
+        app_logger.query(question, success=True, duration_ms=total_time)
+        
+        return QueryResult(
+            success=True,
+            question=question,
+            answer=answer,
+            data=exec_result.result,
+            data_type=result_type,
+            code=gen_result.code,
+            execution_time_ms=exec_result.execution_time_ms,
+            generation_time_ms=gen_result.generation_time_ms,
+            total_time_ms=total_time,
+            warnings=warnings
+        )
+    
+    def _error_from_exception(self, question: str, error: Exception, start_time: float) -> QueryResult:
+        """Map an exception raised inside the pipeline to an error result."""
+        if isinstance(error, ChatbotError):
             return self._create_error_result(
                 question=question,
-                error="An unexpected error occurred. Please try again.",
-                error_code="UNEXPECTED_ERROR",
+                error=error.user_message,
+                error_code=error.code.name if hasattr(error, 'code') else "ERROR",
                 start_time=start_time
             )
+        
+        app_logger.error(
+            "Unexpected error processing question",
+            error=str(error),
+            error_type=type(error).__name__
+        )
+        return self._create_error_result(
+            question=question,
+            error="An unexpected error occurred. Please try again.",
+            error_code="UNEXPECTED_ERROR",
+            start_time=start_time
+        )
     
     def _validate_input(self, question: str) -> str:
         """Validate and sanitize user input."""
         try:
-            return sanitize_input(question, config.security.max_input_length)
+            return sanitize_input(question, self._max_input_len)
         except ValueError as e:
             raise InputValidationError(str(e))
     
+    @staticmethod
+    def _generation_key(question: str, schema: str) -> tuple:
+        """Cache key for generated code (case kept: questions carry data literals)."""
+        return (question.strip(), hash(schema))
+    
     def _generate_code(self, question: str, schema: str) -> GenerationResult:
-        """Generate pandas code from question."""
+        """Generate pandas code from question (cached per question and schema)."""
+        cached = self._cached_generation(self._generation_key(question, schema))
+        if cached is not None:
+            return cached
         return self.code_generator.generate_from_question(question, schema)
     
+    async def _generate_code_async(self, question: str, schema: str) -> GenerationResult:
+        """Generate pandas code without blocking the event loop (cached)."""
+        cached = self._cached_generation(self._generation_key(question, schema))
+        if cached is not None:
+            return cached
+        
+        async with _llm_gate():
+            return await self.code_generator.generate_from_question_async(
+                question, schema
+            )
+    
+    def _remember_code(self, question: str, schema: str, gen_result: GenerationResult) -> None:
+        """Cache code that has validated and executed successfully."""
+        self._gen_cache.put(self._generation_key(question, schema), gen_result)
+    
+    def _forget_code(self, question: str, schema: str) -> None:
+        """Evict cached code that failed validation or execution."""
+        self._gen_cache.pop(self._generation_key(question, schema))
+    
+    def _cached_generation(self, key: tuple) -> Optional[GenerationResult]:
+        """Get previously generated code, reported as taking no LLM time."""
+        cached = self._gen_cache.get(key)
+        if cached is None:
+            return None
+        app_logger.debug("Reusing generated code", model=cached.model)
+        return replace(cached, generation_time_ms=0.0)
+    
     def _validate_code(self, code: str) -> ValidationResult:
         """Validate generated code for security."""
+        from .code_validator import validate_code
         return validate_code(code)
     
     def _execute_code(self, code: str, df: pd.DataFrame) -> ExecutionResult:
         """Execute validated code."""
+        from .code_executor import execute_code
         return execute_code(code, df)
     
     def _generate_response(self, question: str, results: str, code: str) -> str:
@@ -288,11 +672,22 @@ class QueryProcessor:
         try:
             return self.response_generator.generate_response(question, results, code)
         except Exception as e:
-            app_logger.warning(
-                "Response generation failed",
-                error=str(e)
-            )
-            return f"Here are the results:\n\n{results}"
+            return self._fallback_answer(e, results)
+    
+    async def _generate_response_async(self, question: str, results: str, code: str) -> str:
+        """Generate natural language response without blocking the event loop."""
+        try:
+            return await self.response_generator.generate_response_async(question, results, code)
+        except Exception as e:
+            return self._fallback_answer(e, results)
+    
+    def _fallback_answer(self, error: Exception, results: str) -> str:
+        """Log a failed response generation and show the raw results."""
+        app_logger.warning(
+            "Response generation failed",
+            error=str(error)
+        )
+        return f"Here are the results:\n\n{results}"
     
     def _create_error_result(
         self,
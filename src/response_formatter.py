@@ -13,12 +13,10 @@ import re
 
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
-from config import config
-from logger import app_logger
+from .config import config
+from .logger import app_logger
 
 
 @dataclass
@@ -128,6 +126,12 @@ class VisualizationGenerator:
         self.chart_height = config.ui.default_chart_height
         self.theme = config.ui.chart_theme
     
+    @property
+    def px(self):
+        """plotly.express, imported on first chart (it is slow to import)."""
+        import plotly.express as px
+        return px
+    
     def generate(
         self, 
         data: Any, 
@@ -205,7 +209,7 @@ class VisualizationGenerator:
         title = self._generate_title(question, 'Comparison')
         
         if isinstance(data, pd.Series):
-            fig = px.bar(
+            fig = self.px.bar(
                 x=data.index.astype(str),
                 y=data.values,
                 labels={'x': data.index.name or 'Category', 'y': data.name or 'Value'},
@@ -215,7 +219,7 @@ class VisualizationGenerator:
         elif isinstance(data, pd.DataFrame):
             # Use first column as x, others as y
             if len(data.columns) >= 2:
-                fig = px.bar(
+                fig = self.px.bar(
                     data,
                     x=data.columns[0],
                     y=data.columns[1:].tolist(),
@@ -224,7 +228,7 @@ class VisualizationGenerator:
                     color_discrete_sequence=self.COLORS
                 )
             else:
-                fig = px.bar(
+                fig = self.px.bar(
                     data,
                     title=title,
                     color_discrete_sequence=self.COLORS
@@ -255,7 +259,7 @@ class VisualizationGenerator:
         title = self._generate_title(question, 'Trend')
         
         if isinstance(data, pd.Series):
-            fig = px.line(
+            fig = self.px.line(
                 x=data.index,
                 y=data.values,
                 labels={'x': data.index.name or 'Index', 'y': data.name or 'Value'},
@@ -263,7 +267,7 @@ class VisualizationGenerator:
                 markers=True
             )
         elif isinstance(data, pd.DataFrame):
-            fig = px.line(
+            fig = self.px.line(
                 data,
                 title=title,
                 markers=True,
@@ -295,14 +299,14 @@ class VisualizationGenerator:
         title = self._generate_title(question, 'Distribution')
         
         if isinstance(data, pd.Series):
-            fig = px.pie(
+            fig = self.px.pie(
                 values=data.values,
                 names=data.index.astype(str),
                 title=title,
                 color_discrete_sequence=self.COLORS
             )
         elif isinstance(data, pd.DataFrame) and len(data.columns) >= 2:
-            fig = px.pie(
+            fig = self.px.pie(
                 data,
                 values=data.columns[1],
                 names=data.columns[0],
@@ -346,7 +350,7 @@ class VisualizationGenerator:
         x_col = data.columns[0]
         y_col = data.columns[1]
         
-        fig = px.scatter(
+        fig = self.px.scatter(
             data,
             x=x_col,
             y=y_col,
@@ -373,13 +377,13 @@ class VisualizationGenerator:
         title = self._generate_title(question, 'Distribution')
         
         if isinstance(data, pd.Series):
-            fig = px.box(
+            fig = self.px.box(
                 y=data.values,
                 title=title,
                 color_discrete_sequence=self.COLORS
             )
         elif isinstance(data, pd.DataFrame):
-            fig = px.box(
+            fig = self.px.box(
                 data,
                 title=title,
                 color_discrete_sequence=self.COLORS
@@ -410,7 +414,7 @@ class VisualizationGenerator:
         title = self._generate_title(question, 'Distribution')
         
         if isinstance(data, pd.Series):
-            fig = px.histogram(
+            fig = self.px.histogram(
                 x=data.values,
                 title=title,
                 color_discrete_sequence=self.COLORS
@@ -419,7 +423,7 @@ class VisualizationGenerator:
             # Use first numeric column
             numeric_cols = data.select_dtypes(include=[np.number]).columns
             if len(numeric_cols) > 0:
-                fig = px.histogram(
+                fig = self.px.histogram(
                     data,
                     x=numeric_cols[0],
                     title=title,
@@ -480,7 +484,7 @@ class VisualizationGenerator:
                 )
             corr_matrix = numeric_data.corr()
         
-        fig = px.imshow(
+        fig = self.px.imshow(
             corr_matrix,
             title=title,
             color_continuous_scale='RdBu_r',
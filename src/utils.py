@@ -6,15 +6,58 @@ Provides schema extraction, prompt templates, and helper functions.
 Developer: aliawada127001@outlook.com
 """
 
+import io
 import re
-from typing import Tuple, Optional
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, Tuple, Optional
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from .config import config
+
+
+# Precompiled patterns used on every question / LLM response
+
+_FENCE_OPEN_RE = re.compile(r'^```\w*\s*')
+_PRINT_RE = re.compile(r'\bprint\s*\((.*)\)')
+
+# Lowercased line starts that mark prose rather than code in LLM output
+_PROSE_PREFIXES = ('here', 'this', 'the ', 'to ', 'i ')
+
+# Explanation comments stripped by clean_code
+_LONG_FULL_COMMENT_RE = re.compile(r'^(?=[^\n]{50,}$)[^\S\n]*#[^\n]*(?:\n|$)', re.MULTILINE)
+_TRAILING_COMMENT_RE = re.compile(r'^([^#\n]*[^\s#])[^\S\n]*#[^#\n]{30,}[^\n]*$', re.MULTILINE)
+
+# Code injection patterns rejected in user input, fused into a single
+# alternation so the input is scanned once instead of once per pattern.
+# The lookahead on the patterns' possible first characters lets the engine
+# skip every other position without trying all seven branches there.
+_DANGEROUS_RE = re.compile(
+    '(?=[_ieos])(?:' + '|'.join((
+        r'__\w+__',           # Dunder methods
+        r'import\s+\w+',      # Import statements
+        r'exec\s*\(',         # exec()
+        r'eval\s*\(',         # eval()
+        r'open\s*\(',         # open()
+        r'os\.\w+',           # os module
+        r'sys\.\w+',          # sys module
+    )) + ')',
+    re.IGNORECASE
+)
 
 
 def extract_schema(df: pd.DataFrame) -> str:
     """
     Extract DataFrame schema as a formatted string for LLM context.
     
+    Column statistics are computed by a single ``DataFrame.agg`` call with a
+    per-column spec (count, plus nunique and min/max for numeric/datetime
+    columns) rather than one pandas call per statistic.
+    
     Args:
         df: The pandas DataFrame to analyze
         
@@ -25,36 +68,123 @@ def extract_schema(df: pd.DataFrame) -> str:
     
     # Basic info
     schema_parts.append(f"Shape: {df.shape[0]} rows × {df.shape[1]} columns\n")
-    
-    # Column details
     schema_parts.append("Columns:")
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        non_null = df[col].notna().sum()
-        unique = df[col].nunique()
-        
-        # Sample values (for categorical or string columns)
-        if df[col].dtype == 'object' or unique <= 10:
-            samples = df[col].dropna().unique()[:5]
-            sample_str = f" | Examples: {list(samples)}"
+    if df.shape[1] == 0:
+        return "\n".join(schema_parts)
+    
+    # Dtypes are read positionally from one Series, not per-column lookups
+    dtypes = df.dtypes
+    orderable = {
+        col for col, dtype in zip(df.columns, dtypes)
+        if is_numeric_dtype(dtype) or is_datetime64_any_dtype(dtype)
+    }
+    
+    # One aggregation plan for all column statistics. Only orderable
+    # (numeric/datetime) columns need nunique up front, to choose between a
+    # range and examples; every other column gets examples anyway, and its
+    # unique count is read off the same uniques array
+    spec = {
+        col: ['count', 'nunique', 'min', 'max'] if col in orderable else ['count']
+        for col in df.columns
+    }
+    stats = df.agg(spec)
+    
+    # Column details: numeric/datetime columns with many values are
+    # summarized by range; everything else (text, categories,
+    # low-cardinality) gets examples
+    for i, col in enumerate(df.columns):
+        non_null = int(stats.at['count', col])
+        if col in orderable and stats.at['nunique', col] > 10:
+            unique = int(stats.at['nunique', col])
+            sample_str = f" | Range: [{stats.at['min', col]}, {stats.at['max', col]}]"
         else:
-            sample_str = f" | Range: [{df[col].min()}, {df[col].max()}]"
+            # Dedupe first, then drop NaN from the (small) uniques array
+            samples = df[col].unique()
+            samples = samples[pd.notna(samples)]
+            unique = len(samples)
+            sample_str = f" | Examples: {list(samples[:5])}"
         
         schema_parts.append(
-            f"  - {col}: {dtype} ({non_null} non-null, {unique} unique){sample_str}"
+            f"  - {col}: {dtypes.iat[i]} ({non_null} non-null, {unique} unique){sample_str}"
         )
     
     return "\n".join(schema_parts)
 
 
-def get_column_descriptions() -> str:
+# Process-wide schema cache: (id(df), shape, columns) -> (weakref(df), schema).
+# The weakref guards against a recycled id() pointing at a different frame.
+_SCHEMA_CACHE_SIZE = 8
+_schema_cache: "OrderedDict[tuple, Tuple[weakref.ref, str]]" = OrderedDict()
+
+
+def get_cached_schema(df: pd.DataFrame, refresh: bool = False) -> str:
     """
-    Get human-readable column descriptions for the educational dataset.
+    Get the schema for a DataFrame, reusing it if this frame was seen before.
     
+    Args:
+        df: The pandas DataFrame to analyze
+        refresh: Recompute even if a cached schema exists
+        
     Returns:
-        Formatted column descriptions
+        Formatted schema description string
     """
-    return """
+    key = (id(df), df.shape, tuple(df.columns))
+    
+    entry = _schema_cache.get(key)
+    if not refresh and entry is not None and entry[0]() is df:
+        _schema_cache.move_to_end(key)
+        return entry[1]
+    
+    schema = extract_schema(df)
+    _schema_cache[key] = (weakref.ref(df), schema)
+    _schema_cache.move_to_end(key)
+    if len(_schema_cache) > _SCHEMA_CACHE_SIZE:
+        _schema_cache.popitem(last=False)
+    
+    return schema
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache.
+    
+    Used for LLM results, which are expensive to produce and may be
+    requested from several Streamlit sessions at once.
+    """
+    
+    def __init__(self, maxsize: int = 256):
+        """Initialize with the maximum number of entries."""
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value (marking it recently used), or None."""
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove and return a cached value, or None if absent."""
+        with self._lock:
+            return self._data.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Static prompt fragment, stripped once at import instead of on every prompt
+_COLUMN_DESCRIPTIONS = """
 IMPORTANT DATA STRUCTURE:
 - Each student has MULTIPLE rows (one per course/assessment combination)
 - student_id uniquely identifies a student
@@ -75,23 +205,25 @@ Column Descriptions:
 """.strip()
 
 
-def build_code_generation_prompt(question: str, schema: str) -> str:
+def get_column_descriptions() -> str:
     """
-    Build the prompt for LLM code generation.
+    Get human-readable column descriptions for the educational dataset.
     
-    Args:
-        question: User's natural language question
-        schema: DataFrame schema description
-        
     Returns:
-        Complete prompt for code generation
+        Formatted column descriptions
     """
-    return f"""You are a pandas expert. Generate ONLY executable Python pandas code to answer the user's question.
+    return _COLUMN_DESCRIPTIONS
+
+
+# Code-generation prompt. Only the schema and the question change per call,
+# so the static text (including the column descriptions) is filled in once
+# at import and kept as three fixed pieces joined around them.
+_CODE_PROMPT_TEMPLATE = """You are a pandas expert. Generate ONLY executable Python pandas code to answer the user's question.
 
 DATAFRAME SCHEMA:
 {schema}
 
-{get_column_descriptions()}
+{descriptions}
 
 EXAMPLE QUERIES:
 1. "How many males/females" → df.drop_duplicates('student_id')['student_gender'].value_counts()
@@ -113,6 +245,24 @@ INSTRUCTIONS:
 5. Code must be a single expression or a few lines ending with the result
 
 CODE:"""
+_CODE_PROMPT_HEAD, _CODE_PROMPT_MIDDLE, _CODE_PROMPT_TAIL = re.split(
+    r'\{schema\}|\{question\}',
+    _CODE_PROMPT_TEMPLATE.replace('{descriptions}', _COLUMN_DESCRIPTIONS)
+)
+
+
+def build_code_generation_prompt(question: str, schema: str) -> str:
+    """
+    Build the prompt for LLM code generation.
+    
+    Args:
+        question: User's natural language question
+        schema: DataFrame schema description
+        
+    Returns:
+        Complete prompt for code generation
+    """
+    return ''.join((_CODE_PROMPT_HEAD, schema, _CODE_PROMPT_MIDDLE, question, _CODE_PROMPT_TAIL))
 
 
 def build_response_prompt(question: str, results: str, code: str) -> str:
@@ -148,6 +298,64 @@ INSTRUCTIONS:
 RESPONSE:"""
 
 
+def _fence_body(response: str, open_idx: int) -> Tuple[Optional[str], int]:
+    """
+    Get the contents of the fence opening at ``open_idx``.
+    
+    Args:
+        response: Raw LLM response
+        open_idx: Index of the opening ```
+        
+    Returns:
+        Tuple of (stripped contents, index of the closing ```), or
+        (None, -1) if the fence is never closed
+    """
+    start = open_idx + 3
+    close_idx = response.find('```', start)
+    if close_idx < 0:
+        return None, -1
+    
+    # Skip a language tag line (```python, ```py, or bare ```)
+    newline_idx = response.find('\n', start, close_idx)
+    if newline_idx >= 0:
+        tag = response[start:newline_idx].strip()
+        if not tag or tag.isidentifier():
+            start = newline_idx + 1
+    
+    return response[start:close_idx].strip(), close_idx
+
+
+def _extract_fenced(response: str) -> Optional[str]:
+    """
+    Get the code inside the markdown fences of a response.
+    
+    A ```python block anywhere in the reply wins, so shell commands or
+    sample output fenced before the code are not mistaken for it.
+    Otherwise the first fence is used (bare ```, other tags, or inline
+    ```code``` spans). Empty fences are skipped in both passes. Fences
+    are located with str.find rather than DOTALL regex searches.
+    
+    Args:
+        response: Raw LLM response
+        
+    Returns:
+        Stripped code inside the fence, or None if no closed fence has any
+    """
+    for marker in ('```python', '```'):
+        open_idx = response.find(marker)
+        while open_idx >= 0:
+            body, close_idx = _fence_body(response, open_idx)
+            if body is None:
+                break
+            if body:
+                return body
+            open_idx = response.find(marker, close_idx + 3)
+    return None
+
+
+# Pure str -> str functions: identical LLM outputs (retries, repeated
+# questions) are cleaned once. Keys are whole responses, so keep N small.
+@lru_cache(maxsize=64)
 def extract_code_from_response(response: str) -> str:
     """
     Extract Python code from LLM response.
@@ -164,35 +372,32 @@ def extract_code_from_response(response: str) -> str:
         Extracted and cleaned code string
     """
     # Try to extract from markdown code block
-    patterns = [
-        r'```python\s*\n(.*?)```',  # ```python ... ```
-        r'```\s*\n(.*?)```',         # ``` ... ```
-        r'```(.*?)```',              # Inline code block
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, response, re.DOTALL)
-        if match:
-            code = match.group(1).strip()
-            if code:
-                return clean_code(code)
-    
-    # If no code block, try to extract code-like lines
-    lines = response.strip().split('\n')
+    code = _extract_fenced(response)
+    if code:
+        return clean_code(code)
+    
+    # If no code block, try to extract code-like lines (each line is
+    # stripped, so the response itself needs no outer strip() copy)
     code_lines = []
+    append = code_lines.append
     
-    for line in lines:
+    for line in response.split('\n'):
         stripped = line.strip()
         # Skip empty lines, comments that look like prose, and non-code lines
         if not stripped:
             continue
         if stripped.startswith('#') and len(stripped) > 50:
             continue
-        if any(stripped.lower().startswith(x) for x in ['here', 'this', 'the ', 'to ', 'i ']):
+        if stripped.lower().startswith(_PROSE_PREFIXES):
             continue
         # Likely code if it contains pandas operations or assignments
-        if any(x in stripped for x in ['df', 'pd.', 'np.', '=', '.', '(', '[', 'groupby']):
-            code_lines.append(stripped)
+        # ('pd.' and 'np.' are covered by '.'); chained `in` tests avoid a
+        # generator and beat a regex on these short lines
+        if (
+            '.' in stripped or '=' in stripped or '(' in stripped
+            or '[' in stripped or 'df' in stripped or 'groupby' in stripped
+        ):
+            append(stripped)
     
     if code_lines:
         return clean_code('\n'.join(code_lines))
@@ -201,6 +406,7 @@ def extract_code_from_response(response: str) -> str:
     return clean_code(response)
 
 
+@lru_cache(maxsize=64)
 def clean_code(code: str) -> str:
     """
     Clean and normalize extracted code.
@@ -211,40 +417,103 @@ def clean_code(code: str) -> str:
     Returns:
         Cleaned code string
     """
-    # Remove markdown artifacts
-    code = re.sub(r'^```\w*\s*', '', code)
-    code = re.sub(r'```\s*$', '', code)
+    # Remove markdown artifacts; cheap prefix/suffix tests decide whether
+    # there is anything to strip (trailing whitespace is stripped below)
+    if code.startswith('```'):
+        code = _FENCE_OPEN_RE.sub('', code)
+    code = code.rstrip()
+    if code.endswith('```'):
+        code = code[:-3]
     
     # Remove 'CODE:' prefix if present
-    code = re.sub(r'^CODE:\s*', '', code, flags=re.IGNORECASE)
+    if code[:5].upper() == 'CODE:':
+        code = code[5:].lstrip()
     
     # Remove print statements (we capture the result directly)
-    code = re.sub(r'\bprint\s*\((.*)\)', r'\1', code)
+    code = _PRINT_RE.sub(r'\1', code)
     
     # Remove leading/trailing whitespace
     code = code.strip()
     
-    # Remove any trailing comments that look like explanations
-    lines = code.split('\n')
-    cleaned_lines = []
-    for line in lines:
-        # Keep the line but remove trailing explanation comments
-        if '#' in line:
-            parts = line.split('#')
-            # Keep code part and short comments only
-            if len(parts[0].strip()) > 0:
-                if len(parts) > 1 and len(parts[1]) < 30:
-                    cleaned_lines.append(line)
-                else:
-                    cleaned_lines.append(parts[0].rstrip())
-            else:
-                # It's a full-line comment - keep if short
-                if len(line) < 50:
-                    cleaned_lines.append(line)
-        else:
-            cleaned_lines.append(line)
+    # Remove explanation comments: full-line comments of 50+ characters
+    # are dropped, and trailing comments of 30+ characters are cut off
+    code = _LONG_FULL_COMMENT_RE.sub('', code)
+    code = _TRAILING_COMMENT_RE.sub(r'\1', code)
     
-    return '\n'.join(cleaned_lines).strip()
+    return code.strip()
+
+
+def _format_scalar(result) -> Tuple[str, str]:
+    """Format a Python or numpy number, rounding floats to 4 places."""
+    if isinstance(result, (float, np.floating)):
+        result = round(result, 4)
+    return str(result), "scalar"
+
+
+def _format_string(result: str) -> Tuple[str, str]:
+    """Format a string result (returned as-is)."""
+    return result, "string"
+
+
+def _format_list(result) -> Tuple[str, str]:
+    """Format a list or tuple result."""
+    return str(result), "list"
+
+
+def _format_series(result: pd.Series) -> Tuple[str, str]:
+    """Format a Series, truncated to its head and tail when long."""
+    if len(result) > config.data.csv_display_threshold:
+        return _format_as_csv(result, "items"), "series"
+    
+    # to_string truncates to head/tail itself, without building a new Series
+    max_rows = config.data.max_display_rows
+    text = result.to_string(max_rows=max_rows, min_rows=max_rows)
+    if len(result) > max_rows:
+        half = max_rows // 2
+        text = f"Showing first {half} and last {half} of {len(result)} items:\n{text}"
+    return text, "series"
+
+
+def _format_dataframe(result: pd.DataFrame) -> Tuple[str, str]:
+    """Format a DataFrame, truncated to its head and tail when long."""
+    if len(result) > config.data.csv_display_threshold:
+        shown = result.iloc[:, :config.data.max_display_cols]
+        return _format_as_csv(shown, "rows"), "dataframe"
+    
+    # to_string truncates to head/tail itself, without building a new frame
+    max_rows = config.data.max_display_rows
+    text = result.to_string(
+        max_rows=max_rows,
+        min_rows=max_rows,
+        max_cols=config.data.max_display_cols
+    )
+    if len(result) > max_rows:
+        half = max_rows // 2
+        text = f"Showing first {half} and last {half} of {len(result)} rows:\n{text}"
+    return text, "dataframe"
+
+
+# Exact-type dispatch for format_result_for_display; subclasses fall back
+# to the isinstance checks in _FORMATTER_BASES (checked in order)
+_FORMATTER_BASES = (
+    ((int, float, np.number, np.bool_), _format_scalar),
+    (str, _format_string),
+    ((list, tuple), _format_list),
+    (pd.Series, _format_series),
+    (pd.DataFrame, _format_dataframe),
+)
+_FORMATTERS = {
+    int: _format_scalar,
+    float: _format_scalar,
+    bool: _format_scalar,
+    np.int64: _format_scalar,
+    np.float64: _format_scalar,
+    str: _format_string,
+    list: _format_list,
+    tuple: _format_list,
+    pd.Series: _format_series,
+    pd.DataFrame: _format_dataframe,
+}
 
 
 def format_result_for_display(result) -> Tuple[str, str]:
@@ -257,33 +526,40 @@ def format_result_for_display(result) -> Tuple[str, str]:
     Returns:
         Tuple of (formatted_text, result_type)
     """
-    if isinstance(result, pd.DataFrame):
-        if len(result) > 20:
-            display_df = pd.concat([result.head(10), result.tail(10)])
-            text = f"Showing first 10 and last 10 of {len(result)} rows:\n{display_df.to_string()}"
+    # One dict lookup for the common exact types instead of an isinstance chain
+    formatter = _FORMATTERS.get(type(result))
+    if formatter is None:
+        for bases, candidate in _FORMATTER_BASES:
+            if isinstance(result, bases):
+                formatter = candidate
+                break
         else:
-            text = result.to_string()
-        return text, "dataframe"
+            return str(result), "other"
     
-    elif isinstance(result, pd.Series):
-        if len(result) > 20:
-            display_series = pd.concat([result.head(10), result.tail(10)])
-            text = f"Showing first 10 and last 10 of {len(result)} items:\n{display_series.to_string()}"
-        else:
-            text = result.to_string()
-        return text, "series"
-    
-    elif isinstance(result, (int, float)):
-        text = str(round(result, 4) if isinstance(result, float) else result)
-        return text, "scalar"
+    return formatter(result)
+
+
+def _format_as_csv(result, unit: str) -> str:
+    """
+    Format the head and tail of a very large result as CSV.
     
-    elif isinstance(result, (list, tuple)):
-        text = str(result)
-        return text, "list"
+    The text only feeds the response LLM, so pretty alignment is skipped
+    in favour of pandas' C CSV writer.
     
-    else:
-        text = str(result)
-        return text, "other"
+    Args:
+        result: DataFrame or Series to format
+        unit: Name of the counted elements ("rows" or "items")
+        
+    Returns:
+        Head and tail of the result as CSV text
+    """
+    half = config.data.max_display_rows // 2
+    buf = io.StringIO()
+    buf.write(f"Showing first {half} and last {half} of {len(result)} {unit}:\n")
+    result.head(half).to_csv(buf)
+    buf.write("...\n")
+    result.tail(half).to_csv(buf, header=False)
+    return buf.getvalue().rstrip()
 
 
 def sanitize_input(text: str, max_length: int = 1000) -> str:
@@ -308,19 +584,8 @@ def sanitize_input(text: str, max_length: int = 1000) -> str:
     text = text.strip()
     
     # Check for code injection patterns
-    dangerous_patterns = [
-        r'__\w+__',           # Dunder methods
-        r'import\s+\w+',      # Import statements
-        r'exec\s*\(',         # exec()
-        r'eval\s*\(',         # eval()
-        r'open\s*\(',         # open()
-        r'os\.\w+',           # os module
-        r'sys\.\w+',          # sys module
-    ]
-    
-    for pattern in dangerous_patterns:
-        if re.search(pattern, text, re.IGNORECASE):
-            raise ValueError("Input contains potentially unsafe patterns.")
+    if _DANGEROUS_RE.search(text):
+        raise ValueError("Input contains potentially unsafe patterns.")
     
     return text
 
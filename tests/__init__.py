@@ -7,8 +7,8 @@ Developer: aliawada127001@outlook.com
 import sys
 from pathlib import Path
 
-# Add src directory to path for imports
-src_path = Path(__file__).parent.parent / "src"
-sys.path.insert(0, str(src_path))
+# Add project root to path so the src package is importable
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
 
 
@@ -13,11 +13,11 @@ import numpy as np
 import sys
 from pathlib import Path
 
-# Add src directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+# Add project root to path so the src package is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from code_executor import CodeExecutor, execute_code, ExecutionResult
-from exceptions import ExecutionTimeoutError
+from src.code_executor import CodeExecutor, execute_code, ExecutionResult
+from src.exceptions import ExecutionTimeoutError
 
 
 @pytest.fixture
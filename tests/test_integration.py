@@ -11,8 +11,8 @@ import pandas as pd
 import sys
 from pathlib import Path
 
-# Add src directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+# Add project root to path so the src package is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
 
 @pytest.fixture
@@ -33,12 +33,33 @@ def sample_df():
     })
 
 
+@pytest.fixture
+def stub_data_manager(sample_df):
+    """DataManager serving sample_df with a fixed schema (no file access)."""
+    import threading
+    from src.query_processor import DataManager
+    
+    class StubDataManager(DataManager):
+        def __init__(self, df):
+            self._df = df
+            self.load_threads = set()
+        
+        def load_data(self, force_reload=False):
+            self.load_threads.add(threading.get_ident())
+            return self._df
+        
+        def get_schema(self, force_refresh=False):
+            return "schema"
+    
+    return StubDataManager(sample_df)
+
+
 class TestUtilsFunctions:
     """Test utility functions."""
     
     def test_extract_schema(self, sample_df):
         """Test schema extraction."""
-        from utils import extract_schema
+        from src.utils import extract_schema
         
         schema = extract_schema(sample_df)
         
@@ -46,16 +67,51 @@ class TestUtilsFunctions:
         assert 'assessment_score' in schema
         assert 'Columns:' in schema
     
+    def test_extract_schema_range_and_examples(self):
+        """Test that wide numeric columns get ranges and others get examples."""
+        from src.utils import extract_schema
+        
+        df = pd.DataFrame({
+            'score': range(50, 70),
+            'course_name': pd.Categorical(['Math', 'Biology'] * 10),
+        })
+        schema = extract_schema(df)
+        
+        assert 'score: int64 (20 non-null, 20 unique) | Range: [50, 69]' in schema
+        assert "Examples: ['Math', 'Biology']" in schema
+    
+    def test_cached_schema_reused(self, sample_df):
+        """Test that the schema is reused for the same DataFrame object."""
+        from src.utils import get_cached_schema
+        
+        first = get_cached_schema(sample_df)
+        assert get_cached_schema(sample_df) is first
+        assert get_cached_schema(sample_df, refresh=True) == first
+        assert get_cached_schema(sample_df.copy()) is not first
+    
+    def test_lru_cache_evicts_oldest(self):
+        """Test LRU eviction order."""
+        from src.utils import LRUCache
+        
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        cache.put('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+    
     def test_sanitize_input_valid(self):
         """Test valid input sanitization."""
-        from utils import sanitize_input
+        from src.utils import sanitize_input
         
         result = sanitize_input("What is the average score?")
         assert result == "What is the average score?"
     
     def test_sanitize_input_too_long(self):
         """Test input that's too long."""
-        from utils import sanitize_input
+        from src.utils import sanitize_input
         
         long_input = "a" * 1001
         with pytest.raises(ValueError):
@@ -63,14 +119,14 @@ class TestUtilsFunctions:
     
     def test_sanitize_input_dangerous(self):
         """Test dangerous input patterns."""
-        from utils import sanitize_input
+        from src.utils import sanitize_input
         
         with pytest.raises(ValueError):
             sanitize_input("import os; os.system('rm -rf /')")
     
     def test_extract_code_from_response(self):
         """Test code extraction from LLM response."""
-        from utils import extract_code_from_response
+        from src.utils import extract_code_from_response
         
         response = """
         Here's the code:
@@ -83,23 +139,73 @@ class TestUtilsFunctions:
         assert 'groupby' in code
         assert 'mean' in code
     
+    def test_extract_code_fence_variants(self):
+        """Test code extraction from bare, tagged and inline fences."""
+        from src.utils import extract_code_from_response
+        
+        assert extract_code_from_response("```\ndf.head()\n```") == "df.head()"
+        assert extract_code_from_response("```py\ndf.tail()\n```") == "df.tail()"
+        assert extract_code_from_response("Use ```df.sum()``` here") == "df.sum()"
+        
+        # A ```python block wins over earlier shell or sample-output fences
+        bash_first = "```bash\npip install pandas\n```\nThen:\n```python\ndf.head()\n```"
+        assert extract_code_from_response(bash_first) == "df.head()"
+        text_first = "Output:\n```text\n   score\n0  85\n```\n```python\ndf.mean()\n```"
+        assert extract_code_from_response(text_first) == "df.mean()"
+        
+        # Empty fences are skipped
+        assert extract_code_from_response("```python\n```\n```python\ndf.max()\n```") == "df.max()"
+        assert extract_code_from_response("```\n\n```\n```\ndf.min()\n```") == "df.min()"
+    
     def test_format_result_dataframe(self, sample_df):
         """Test formatting DataFrame result."""
-        from utils import format_result_for_display
+        from src.utils import format_result_for_display
         
         text, result_type = format_result_for_display(sample_df)
         
         assert result_type == 'dataframe'
         assert 'student_id' in text
     
+    def test_format_result_truncates_long_dataframe(self):
+        """Test that long results show only the head and tail rows."""
+        from src.utils import format_result_for_display
+        
+        df = pd.DataFrame({'value': range(1000, 1050)})
+        text, result_type = format_result_for_display(df)
+        
+        assert result_type == 'dataframe'
+        assert text.startswith("Showing first 10 and last 10 of 50 rows:")
+        assert '1009' in text and '1040' in text
+        assert '1025' not in text
+    
+    def test_format_result_large_dataframe_as_csv(self):
+        """Test that very large results are summarized as head/tail CSV."""
+        from src.utils import format_result_for_display
+        
+        df = pd.DataFrame({'value': range(500)})
+        text, result_type = format_result_for_display(df)
+        
+        assert result_type == 'dataframe'
+        assert text.startswith("Showing first 10 and last 10 of 500 rows:")
+        assert ',value' in text and '499,499' in text
+        assert '250,250' not in text
+    
     def test_format_result_scalar(self):
         """Test formatting scalar result."""
-        from utils import format_result_for_display
+        from src.utils import format_result_for_display
         
         text, result_type = format_result_for_display(85.5)
         
         assert result_type == 'scalar'
         assert '85.5' in text
+    
+    def test_format_result_numpy_scalar(self):
+        """Test that numpy scalars are formatted (and rounded) as scalars."""
+        import numpy as np
+        from src.utils import format_result_for_display
+        
+        assert format_result_for_display(np.int32(7)) == ('7', 'scalar')
+        assert format_result_for_display(np.float32(1.234567)) == ('1.2346', 'scalar')
 
 
 class TestCodeValidatorIntegration:
@@ -107,7 +213,7 @@ class TestCodeValidatorIntegration:
     
     def test_valid_complex_query(self):
         """Test complex but valid query."""
-        from code_validator import validate_code
+        from src.code_validator import validate_code
         
         code = """
 result = df.groupby(['course_name', 'class_level'])['assessment_score'].agg(['mean', 'std', 'count'])
@@ -118,8 +224,8 @@ result.reset_index()
     
     def test_invalid_with_import(self):
         """Test that import is blocked."""
-        from code_validator import validate_code
-        from exceptions import SecurityViolationError
+        from src.code_validator import validate_code
+        from src.exceptions import SecurityViolationError
         
         code = """
 import pandas as pd
@@ -134,7 +240,7 @@ class TestCodeExecutorIntegration:
     
     def test_complex_aggregation(self, sample_df):
         """Test complex aggregation."""
-        from code_executor import execute_code
+        from src.code_executor import execute_code
         
         code = """
 result = df.groupby('course_name').agg({
@@ -150,7 +256,7 @@ result
     
     def test_correlation_matrix(self, sample_df):
         """Test correlation calculation."""
-        from code_executor import execute_code
+        from src.code_executor import execute_code
         
         code = "df[['assessment_score', 'attendance_rate', 'raised_hand_count']].corr()"
         result = execute_code(code, sample_df)
@@ -161,7 +267,7 @@ result
     
     def test_filtered_aggregation(self, sample_df):
         """Test filtering followed by aggregation."""
-        from code_executor import execute_code
+        from src.code_executor import execute_code
         
         code = """
 filtered = df[df['assessment_score'] > 80]
@@ -178,7 +284,7 @@ class TestVisualizationGeneration:
     
     def test_bar_chart_detection(self):
         """Test bar chart detection."""
-        from response_formatter import ChartDetector
+        from src.response_formatter import ChartDetector
         import pandas as pd
         
         data = pd.Series([85, 78, 92], index=['Math', 'Science', 'English'])
@@ -188,7 +294,7 @@ class TestVisualizationGeneration:
     
     def test_scatter_detection(self):
         """Test scatter plot detection."""
-        from response_formatter import ChartDetector
+        from src.response_formatter import ChartDetector
         import pandas as pd
         
         data = pd.DataFrame({
@@ -201,7 +307,7 @@ class TestVisualizationGeneration:
     
     def test_visualization_generation(self, sample_df):
         """Test actual visualization generation."""
-        from response_formatter import generate_visualization
+        from src.response_formatter import generate_visualization
         
         data = sample_df.groupby('course_name')['assessment_score'].mean()
         result = generate_visualization(data, "Compare course scores")
@@ -210,19 +316,231 @@ class TestVisualizationGeneration:
         assert result.figure is not None
 
 
+class TestDataManager:
+    """Tests for data and schema caching."""
+    
+    def test_schema_cached_on_disk(self, sample_df, tmp_path):
+        """Test that a new manager reuses the schema written for the same file."""
+        from src.query_processor import DataManager
+        
+        data_path = tmp_path / "data.xlsx"
+        sample_df.to_excel(data_path, index=False)
+        
+        cache_path = data_path.with_suffix('.schema.txt')
+        schema = DataManager(data_path).get_schema()
+        header, _, body = cache_path.read_text(encoding='utf-8').partition('\n')
+        assert body == schema
+        
+        cache_path.write_text(f"{header}\ncached", encoding='utf-8')
+        assert DataManager(data_path).get_schema() == "cached"
+        assert DataManager(data_path).get_schema(force_refresh=True) == schema
+        
+        # A file written for other columns/dtypes, or without a key, is ignored
+        for stale in ("# schema-key: 0\ncached", "cached"):
+            cache_path.write_text(stale, encoding='utf-8')
+            assert DataManager(data_path).get_schema() == schema
+        assert list(tmp_path.glob('*.tmp')) == []
+    
+    def test_schema_cache_keyed_by_sheet(self, sample_df, tmp_path):
+        """Test that sheets with the same columns do not share a cached schema."""
+        from src.query_processor import DataManager
+        
+        data_path = tmp_path / "data.xlsx"
+        renamed = sample_df.assign(student_name=[f'Pupil_{i}' for i in range(10)])
+        with pd.ExcelWriter(data_path) as writer:
+            sample_df.to_excel(writer, sheet_name='A', index=False)
+            renamed.to_excel(writer, sheet_name='B', index=False)
+        
+        schemas = {}
+        for sheet_name in ('A', 'B'):
+            data_manager = DataManager(data_path)
+            data_manager.sheet_name = sheet_name
+            schemas[sheet_name] = data_manager.get_schema()
+        
+        assert 'Student_' in schemas['A'] and 'Student_' not in schemas['B']
+    
+    def test_data_cache_keyed_by_sheet(self, sample_df, tmp_path):
+        """Test that the Parquet cache is only reused for the sheet it holds."""
+        from src.query_processor import DataManager
+        
+        data_path = tmp_path / "data.xlsx"
+        with pd.ExcelWriter(data_path) as writer:
+            sample_df.to_excel(writer, sheet_name='A', index=False)
+            sample_df[['student_id']].to_excel(writer, sheet_name='B', index=False)
+        
+        def load(sheet_name):
+            data_manager = DataManager(data_path)
+            data_manager.sheet_name = sheet_name
+            return data_manager.load_data()
+        
+        first = load('A')
+        assert data_path.with_suffix('.parquet').exists()
+        pd.testing.assert_frame_equal(load('A'), first)
+        assert list(load('B').columns) == ['student_id']
+        assert list(load('A').columns) == list(sample_df.columns)
+        
+        # A cache file without a key (older loader) is ignored
+        sample_df[['student_name']].to_parquet(data_path.with_suffix('.parquet'))
+        assert list(load('A').columns) == list(sample_df.columns)
+        assert list(tmp_path.glob('*.tmp')) == []
+    
+    def test_optimize_dtypes(self):
+        """Test that small integers are narrowed and text is left alone."""
+        from src.query_processor import DataManager
+        
+        df = pd.DataFrame({
+            'course_name': ['Biology', 'Chemistry', 'Biology'],
+            'moodle_views': [1, 2, 3],
+            'big': [0, 1, 2**40],
+        })
+        
+        df = DataManager._optimize_dtypes(df)
+        
+        assert not isinstance(df['course_name'].dtype, pd.CategoricalDtype)
+        assert df['moodle_views'].dtype == 'int32'
+        assert df['big'].dtype == 'int64'
+
+
 class TestEndToEndPipeline:
     """End-to-end pipeline tests (requires Ollama running)."""
     
+    def test_process_question_async(self, sample_df, stub_data_manager):
+        """Test the async pipeline with a stubbed LLM."""
+        import asyncio
+        import threading
+        from src.code_generator import GenerationResult
+        from src.query_processor import QueryProcessor
+        
+        class StubGenerator:
+            async def generate_from_question_async(self, question, schema):
+                return GenerationResult(
+                    success=True,
+                    code="df['assessment_score'].mean()",
+                    raw_response="",
+                    generation_time_ms=0.0,
+                    model="stub"
+                )
+            
+            async def generate_response_async(self, question, results, code):
+                return f"Average: {results}"
+        
+        processor = QueryProcessor(stub_data_manager)
+        processor._code_generator = processor._response_generator = StubGenerator()
+        
+        async def run_concurrently():
+            return await asyncio.gather(*(
+                processor.process_question_async("What is the average score?")
+                for _ in range(3)
+            ))
+        
+        results = asyncio.run(run_concurrently())
+        
+        assert all(r.success for r in results)
+        assert results[0].data == pytest.approx(sample_df['assessment_score'].mean())
+        assert results[0].answer.startswith("Average:")
+        # Data loading never runs on the event loop's thread
+        assert threading.get_ident() not in stub_data_manager.load_threads
+    
+    def test_process_question_async_across_event_loops(self, stub_data_manager):
+        """Test that the async Ollama client works from more than one event loop."""
+        import asyncio
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from src.code_generator import CodeGenerator, ResponseGenerator
+        from src.query_processor import QueryProcessor
+        
+        class OllamaStub(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like Ollama
+            
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                body = json.dumps({
+                    'model': 'stub',
+                    'response': "```python\ndf['assessment_score'].mean()\n```",
+                    'done': True,
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), OllamaStub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            generator = CodeGenerator(base_url=f"http://127.0.0.1:{server.server_port}")
+            attempt_errors = []
+            generator._handle_attempt_error = lambda e, attempt: attempt_errors.append(e)
+            
+            processor = QueryProcessor(stub_data_manager)
+            processor._code_generator = generator
+            processor._response_generator = ResponseGenerator(generator)
+            
+            # Separate asyncio.run calls, as separate requests would make
+            for question in ("Average score", "Mean score"):
+                result = asyncio.run(processor.process_question_async(question))
+                assert result.success
+        finally:
+            server.shutdown()
+            server.server_close()
+        
+        assert attempt_errors == []
+        # Clients of finished loops are not kept around
+        assert len(generator._async_clients) == 1
+    
+    def test_generated_code_cached(self, stub_data_manager):
+        """Test that repeated questions reuse code only after it has run."""
+        from src.code_generator import GenerationResult
+        from src.query_processor import QueryProcessor
+        
+        class CountingGenerator:
+            codes = ["df['missing'].mean()", "df['assessment_score'].mean()"]
+            calls = 0
+            
+            def generate_from_question(self, question, schema):
+                code = self.codes[min(self.calls, len(self.codes) - 1)]
+                self.calls += 1
+                return GenerationResult(
+                    success=True,
+                    code=code,
+                    raw_response="",
+                    generation_time_ms=100.0,
+                    model="stub"
+                )
+            
+            def generate_response(self, question, results, code):
+                return results
+        
+        processor = QueryProcessor(stub_data_manager)
+        processor._code_generator = processor._response_generator = generator = CountingGenerator()
+        
+        failed = processor.process_question("Average score")
+        first = processor.process_question("Average score")
+        again = processor.process_question("  Average score ")
+        processor.process_question("average score")
+        
+        assert failed.error_code == "EXECUTION_FAILED"
+        assert first.success and again.success
+        assert generator.calls == 3
+        assert again.code == first.code
+        assert again.generation_time_ms == 0.0
+    
     @pytest.mark.skip(reason="Requires Ollama to be running")
     def test_full_pipeline(self, sample_df):
         """Test complete query processing pipeline."""
-        from query_processor import QueryProcessor, DataManager
+        from src.query_processor import QueryProcessor, DataManager
         
         # Create a mock data manager
         class MockDataManager(DataManager):
             def __init__(self, df):
                 self._df = df
                 self._schema = None
+                self._schema_key = None
+                self._mtime = None
             
             def load_data(self, force_reload=False):
                 return self._df
@@ -11,11 +11,11 @@ import pytest
 import sys
 from pathlib import Path
 
-# Add src directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+# Add project root to path so the src package is importable
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from code_validator import CodeValidator, validate_code, ValidationResult
-from exceptions import CodeValidationError, SecurityViolationError
+from src.code_validator import CodeValidator, validate_code, ValidationResult
+from src.exceptions import CodeValidationError, SecurityViolationError
 
 
 class TestCodeValidatorAllowlist:
@@ -125,6 +125,20 @@ class TestCodeValidatorPatterns:
         code = "globals()['os']"
         with pytest.raises((CodeValidationError, SecurityViolationError)):
             validate_code(code)
+    
+    @pytest.mark.parametrize("code", [
+        "x.__class__", "exec ('1')", "EVAL(s)", "compile(s)", "__import__('os')",
+        "open('f')", "os.name", "sys.path", "subprocess.run", "f.read()",
+        "f.write (s)", "globals()", "locals()", "getattr(df, 'a')",
+        "setattr(df, 'a', 1)", "lambda x: x", "lambda: 1",
+    ])
+    def test_prefilter_matches_every_pattern(self, code):
+        """Test that the fused prefilter never hides a dangerous pattern."""
+        from src.code_validator import _ANY_DANGEROUS_RE, _DANGEROUS_PATTERNS
+        
+        assert any(pattern.search(code) for pattern, _ in _DANGEROUS_PATTERNS)
+        assert _ANY_DANGEROUS_RE.search(code)
+        assert CodeValidator()._check_dangerous_patterns(code)
 
 
 class TestCodeValidatorSyntax:
@@ -199,6 +213,45 @@ class TestQuickCheck:
         assert validator.quick_check("df.head([") is False
 
 
+class TestLengthPrefilter:
+    """Test the length-bitmap prefilter on operation lookups."""
+    
+    def test_every_blocked_operation_denied(self):
+        """Test that the prefilter never lets a blocked operation through."""
+        from src.config import config
+        from src.code_validator import ValidationStatus
+        
+        validator = CodeValidator()
+        for op in config.security.blocked_operations:
+            assert validator._check_operation(op) == ValidationStatus.DENIED
+    
+    def test_every_allowed_operation_allowed(self):
+        """Test that the prefilter never hides an allowed operation."""
+        from src.config import config
+        from src.code_validator import ValidationStatus
+        
+        validator = CodeValidator()
+        for op in config.security.allowed_operations - config.security.blocked_operations:
+            assert validator._check_operation(op) == ValidationStatus.ALLOWED
+    
+    def test_mask_follows_custom_denylist(self):
+        """Test that the length mask is derived from the instance's own denylist."""
+        from src.config import SecurityConfig
+        
+        security = SecurityConfig(blocked_operations=frozenset({'to_csv'}))
+        assert (security.blocked_operations_len_mask >> len('to_csv')) & 1
+    
+    def test_custom_denylist_enforced(self, monkeypatch):
+        """Test that a non-default denylist is honoured by the validator."""
+        from src.config import config, SecurityConfig
+        
+        monkeypatch.setattr(
+            config, 'security', SecurityConfig(blocked_operations=frozenset({'to_csv'}))
+        )
+        with pytest.raises(SecurityViolationError):
+            CodeValidator().validate("df.to_csv('out.csv')")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 